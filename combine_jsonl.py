@@ -1,5 +1,26 @@
 import json
 
+FLUSH_LINES = 8192  # lines buffered per write
+
+def _copy_lines(src, outf):
+    """Copy the non-empty lines of src to outf in batched writes; returns the number copied."""
+    count = 0
+    batch = []
+    for line in src:
+        line = line.strip()
+        if line:  # Skip empty lines
+            batch.append(line)
+            if len(batch) >= FLUSH_LINES:
+                batch.append(b'')  # trailing newline after the join
+                outf.write(b'\n'.join(batch))
+                count += len(batch) - 1
+                batch.clear()
+    if batch:
+        batch.append(b'')
+        outf.write(b'\n'.join(batch))
+        count += len(batch) - 1
+    return count
+
 def combine_jsonl_files(file1, file2, output_file):
     """
     Combine two JSONL files into a single JSONL file.
@@ -7,15 +28,12 @@ def combine_jsonl_files(file1, file2, output_file):
     
     combined_count = 0
     
-    with open(output_file, 'w', encoding='utf-8') as outf:
+    # Lines are copied through verbatim, so stay in binary mode and skip the decode
+    with open(output_file, 'wb') as outf:
         # Read and write from first file
         try:
-            with open(file1, 'r', encoding='utf-8') as f1:
-                for line in f1:
-                    line = line.strip()
-                    if line:  # Skip empty lines
-                        outf.write(line + '\n')
-                        combined_count += 1
+            with open(file1, 'rb') as f1:
+                combined_count += _copy_lines(f1, outf)
             print(f"Added {combined_count} items from {file1}")
         except FileNotFoundError:
             print(f"Warning: {file1} not found, skipping...")
@@ -24,12 +42,8 @@ def combine_jsonl_files(file1, file2, output_file):
         
         # Read and write from second file
         try:
-            with open(file2, 'r', encoding='utf-8') as f2:
-                for line in f2:
-                    line = line.strip()
-                    if line:  # Skip empty lines
-                        outf.write(line + '\n')
-                        combined_count += 1
+            with open(file2, 'rb') as f2:
+                combined_count += _copy_lines(f2, outf)
             print(f"Added {combined_count - file1_count} items from {file2}")
         except FileNotFoundError:
             print(f"Warning: {file2} not found, skipping...")
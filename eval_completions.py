@@ -5,7 +5,23 @@ from nltk.translate.bleu_score import sentence_bleu, SmoothingFunction
 import numpy as np
 import os
 import json
-import re
+import functools
+from itertools import islice
+
+try:
+    import ijson
+except ImportError:  # ijson is optional; top-level arrays are then loaded with json.load
+    ijson = None
+
+try:
+    from rapidfuzz.distance import Levenshtein
+except ImportError:  # rapidfuzz is optional; see levenshtein_distance below
+    Levenshtein = None
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
 
 def edit_distance(s1: str, s2: str) -> int:
     # Simple Levenshtein distance implementation
@@ -24,6 +40,44 @@ def edit_distance(s1: str, s2: str) -> int:
         previous_row = current_row
     return previous_row[-1]
 
+if njit is not None:
+    @njit(cache=True)
+    def _levenshtein_kernel(a, b):
+        # Two-row DP over code point arrays, same recurrence as edit_distance
+        if a.shape[0] < b.shape[0]:
+            a, b = b, a
+        n = b.shape[0]
+        previous_row = np.arange(n + 1).astype(np.int32)
+        current_row = np.empty(n + 1, dtype=np.int32)
+        for i in range(a.shape[0]):
+            current_row[0] = i + 1
+            c1 = a[i]
+            for j in range(n):
+                best = previous_row[j + 1] + 1
+                if current_row[j] + 1 < best:
+                    best = current_row[j] + 1
+                substitution = previous_row[j] if c1 == b[j] else previous_row[j] + 1
+                if substitution < best:
+                    best = substitution
+                current_row[j + 1] = best
+            previous_row, current_row = current_row, previous_row
+        return previous_row[n]
+
+    def _code_points(s: str) -> np.ndarray:
+        return np.frombuffer(s.encode('utf-32-le', 'surrogatepass'), dtype=np.uint32)
+
+    def edit_distance_jit(s1: str, s2: str) -> int:
+        """Numba-compiled equivalent of edit_distance."""
+        return int(_levenshtein_kernel(_code_points(s1), _code_points(s2)))
+
+# Fastest available implementation: rapidfuzz, then Numba, then pure Python
+if Levenshtein is not None:
+    levenshtein_distance = Levenshtein.distance
+elif njit is not None:
+    levenshtein_distance = edit_distance_jit
+else:
+    levenshtein_distance = edit_distance
+
 def normalized_edit_distance(s1: str, s2: str) -> float:
     """
     Returns the normalized Levenshtein distance between two strings.
@@ -31,7 +85,7 @@ def normalized_edit_distance(s1: str, s2: str) -> float:
     """
     if not s1 and not s2:
         return 0.0
-    dist = edit_distance(s1, s2)
+    dist = levenshtein_distance(s1, s2)
     norm = max(len(s1), 1)
     return dist / norm
 
@@ -43,18 +97,6 @@ def subsume_match(gt: str, pred: str) -> int:
     pred = pred.strip()
     return int(gt in pred or pred in gt)
 
-def extract_fim_middle(text: str) -> str:
-    """
-    If text contains <fim-prefix>**<fim-suffix>**<fim-middle>, return content after <fim-middle>.
-    Otherwise, return text as is.
-    """
-    if not isinstance(text, str):
-        return text
-    match = re.search(r'<fim-middle>(.*)', text, re.DOTALL)
-    if match:
-        return match.group(1).strip()
-    return text
-
 def truncate_to_1_line(text: str) -> str:
     """Extracts the first non-empty line from the text."""
     if not isinstance(text, str):
@@ -62,31 +104,48 @@ def truncate_to_1_line(text: str) -> str:
     lines = [line for line in text.splitlines() if line.strip()]
     return lines[0] if lines else ''
 
+TRUNCATE_CACHE_MAX_LEN = 4096  # longer texts are rarely repeated and would bloat the cache
+
+def _truncate_to_n_lines(text: str, n: int) -> str:
+    # islice stops after n hits, so the remaining lines are never stripped
+    return '\n'.join(islice((line for line in text.splitlines() if line.strip()), n))
+
+_truncate_to_n_lines_cached = functools.lru_cache(maxsize=65536)(_truncate_to_n_lines)
+
 def truncate_to_n_lines(text: str, n: int) -> str:
     """Extracts the first n non-empty lines from the text."""
     if not isinstance(text, str):
         return ''
-    lines = [line for line in text.splitlines() if line.strip()]
-    return '\n'.join(lines[:n])
+    # Short texts (empties, boilerplate) repeat across rows, so memoize them
+    if len(text) < TRUNCATE_CACHE_MAX_LEN:
+        return _truncate_to_n_lines_cached(text, n)
+    return _truncate_to_n_lines(text, n)
 
 def evaluate_completions(df: pd.DataFrame, output_col: str = 'output_after_fim_middle', completion_col: str = 'prediction_after_fim_middle', n: int = 1) -> Dict[str, float]:
     # All metrics should use the filtered df only
     if completion_col not in df.columns or output_col not in df.columns:
         return None
-    gt = df[output_col].astype(str).str.strip().apply(lambda x: truncate_to_n_lines(x, n))
-    pred = df[completion_col].astype(str).str.strip().apply(lambda x: truncate_to_n_lines(x, n))
+    # One pass per column: str() + strip() matches the former astype(str).str.strip()
+    gt = [truncate_to_n_lines(str(v).strip(), n) for v in df[output_col].to_numpy()]
+    pred = [truncate_to_n_lines(str(v).strip(), n) for v in df[completion_col].to_numpy()]
     # Metrics (all uncommented)
-    exact_matches = (gt == pred)
+    exact_matches = np.array(gt, dtype=object) == np.array(pred, dtype=object)
     accuracy = exact_matches.mean()
-    edit_distances = [edit_distance(g, p) for g, p in zip(gt, pred)]
+    edit_distances = [levenshtein_distance(g, p) for g, p in zip(gt, pred)]
     mean_edit_distance = float(np.mean(edit_distances))
-    norm_edit_distances = [normalized_edit_distance(g, p) for g, p in zip(gt, pred)]
+    # Same as normalized_edit_distance, reusing the distances computed above
+    norm_edit_distances = [d / max(len(g), 1) for d, g in zip(edit_distances, gt)]
     mean_normalized_edit_distance = float(np.mean(norm_edit_distances))
     smoothie = SmoothingFunction().method4
-    bleu_scores = [sentence_bleu([g.split()], p.split(), smoothing_function=smoothie) for g, p in zip(gt, pred)]
+    gt_tokens = [g.split() for g in gt]
+    pred_tokens = [p.split() for p in pred]
+    bleu_scores = [sentence_bleu([g], p, smoothing_function=smoothie) for g, p in zip(gt_tokens, pred_tokens)]
     mean_bleu = float(np.mean(bleu_scores))
-    subsume_matches = [subsume_match(g, p) for g, p in zip(gt, pred)]
-    mean_subsume_match = float(np.mean(subsume_matches))
+    # Inlined subsume_match to avoid a Python call per row
+    subsume_matches = np.fromiter(
+        ((g in p or p in g) for g, p in zip(map(str.strip, gt), map(str.strip, pred))),
+        dtype=np.int8, count=len(gt))
+    mean_subsume_match = float(subsume_matches.mean())
     return {
         'count': len(df),
         'evaluated_rows': len(df),
@@ -134,7 +193,7 @@ def evaluate_completions_data(data, output_col: str = 'output_after_fim_middle',
 def extract_evaluation_results(df: pd.DataFrame) -> pd.DataFrame:
     """
     Returns a DataFrame filtered to rows where either 'completion' or 'completions' column exists and is non-empty.
-    Uses a lambda with apply for filtering. Adds debug prints for shape before and after filtering.
+    Uses vectorized string ops for filtering. Adds debug prints for shape before and after filtering.
     """
     print(f"[DEBUG] DataFrame shape before filtering: {df.shape}")
     completion_col = find_column_case_insensitive(df.columns, 'prediction_after_fim_middle')
@@ -142,29 +201,83 @@ def extract_evaluation_results(df: pd.DataFrame) -> pd.DataFrame:
     if not completion_col and not completions_col:
         print("[DEBUG] No 'completion' or 'completions' column found.")
         return df.iloc[0:0]  # Return empty DataFrame if neither column exists
-    def is_non_empty(row):
-        val1 = str(row[completion_col]).strip() if completion_col and pd.notna(row[completion_col]) else ''
-        val2 = str(row[completions_col]).strip() if completions_col and pd.notna(row[completions_col]) else ''
-        return len(val1) > 0 or len(val2) > 0
-    filtered_df = df[df.apply(is_non_empty, axis=1)].copy()
+    def non_empty(col):
+        if not col:
+            return pd.Series(False, index=df.index)
+        return df[col].fillna('').astype(str).str.strip().str.len() > 0
+    filtered_df = df[non_empty(completion_col) | non_empty(completions_col)].copy()
     print(f"[DEBUG] DataFrame shape after filtering: {filtered_df.shape}")
     return filtered_df
 
-def try_load_json_or_jsonl(file_path):
+PREDICTION_KEYS = ('prediction_after_fim_middle', 'predictions_after_fim_middle')
+
+def has_prediction(record) -> bool:
     """
-    Tries to load a file as JSON. If it fails with JSONDecodeError, tries as JSONL.
-    Returns a list of dicts (records).
+    Record-level equivalent of extract_evaluation_results: True if either prediction
+    field (matched case-insensitively) holds a non-empty value.
     """
-    with open(file_path, 'r', encoding='utf-8') as f:
-        try:
-            data = json.load(f)
-            if isinstance(data, dict):
-                return [data]
-            return data
-        except json.JSONDecodeError:
-            # Try as JSONL
+    return any(
+        k.lower() in PREDICTION_KEYS and v is not None and str(v).strip()
+        for k, v in record.items()
+    )
+
+def try_load_json_or_jsonl(file_path, predicate=None, peek_size=64 * 1024):
+    """
+    Yields records from a JSON or JSONL file without loading it twice.
+    The format is detected from the first non-whitespace character: a top-level array
+    is streamed with ijson (when installed), a single JSON object yields one record,
+    and anything else is read line by line as JSONL.
+    If predicate is given, only records for which it returns True are yielded.
+    """
+    records = _iter_json_or_jsonl(file_path, peek_size)
+    if predicate is None:
+        return records
+    return (r for r in records if predicate(r))
+
+def _iter_json_or_jsonl(file_path, peek_size):
+    with open(file_path, 'rb') as f:
+        head = f.read(peek_size).lstrip()
+        f.seek(0)
+        if head.startswith(b'['):
+            if ijson is not None:
+                yield from ijson.items(f, 'item', use_float=True)
+            else:
+                yield from json.load(f)
+            return
+        if head.startswith(b'{'):
+            # A JSONL file has a complete object on its first non-blank line; a
+            # pretty-printed single JSON object does not
+            for first_line in f:
+                if first_line.strip():
+                    break
+            try:
+                json.loads(first_line)
+            except json.JSONDecodeError:
+                f.seek(0)
+                try:
+                    record = json.load(f)
+                except json.JSONDecodeError:
+                    pass  # not a single document either; read it line by line
+                else:
+                    yield record
+                    return
             f.seek(0)
-            return [json.loads(line) for line in f if line.strip()]
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def records_to_dataframe(records, chunk_size=10000):
+    """Builds a DataFrame from an iterable of records, chunk_size rows at a time."""
+    records = iter(records)
+    frames = []
+    while True:
+        batch = list(islice(records, chunk_size))
+        if not batch:
+            break
+        frames.append(pd.DataFrame(batch))
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
 
 def main():
     import sys
@@ -180,10 +293,24 @@ def main():
         df = pd.read_csv(file_path)
         df = extract_evaluation_results(df)
         results = evaluate_completions_data(df, output_col, completion_col, N)
-    elif ext == '.json' or ext == '.jsonl':
-        data = try_load_json_or_jsonl(file_path)
-        df = pd.DataFrame(data)
-        df = extract_evaluation_results(df)
+    elif ext == '.jsonl':
+        try:
+            # Arrow's JSON reader parses into columns, without building Python dicts.
+            # The default dtypes keep missing values as NaN, like the streaming loader
+            df = pd.read_json(file_path, lines=True, engine='pyarrow')
+        except ValueError:
+            # e.g. a column mixing types Arrow can't hold (ArrowInvalid is a ValueError);
+            # fall back to the streaming loader
+            df = None
+        if df is not None:
+            df = extract_evaluation_results(df)
+        else:
+            df = records_to_dataframe(try_load_json_or_jsonl(file_path, predicate=has_prediction))
+        results = evaluate_completions_data(df, output_col, completion_col, N)
+    elif ext == '.json':
+        # A .json file may hold an array, a single object or JSONL; the loader sniffs which.
+        # Rows without a prediction are dropped while loading, so no DataFrame-level filter pass
+        df = records_to_dataframe(try_load_json_or_jsonl(file_path, predicate=has_prediction))
         results = evaluate_completions_data(df, output_col, completion_col, N)
     else:
         print(f"Unsupported file type: {ext}")
@@ -192,6 +319,7 @@ def main():
         print(f"Required columns not found in {file_path}, skipping evaluation.")
     else:
         print(f"Results for first {N} line(s): {results}")
+    _truncate_to_n_lines_cached.cache_clear()
 
 if __name__ == "__main__":
     main()
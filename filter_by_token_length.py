@@ -1,23 +1,29 @@
-import json
+from pipeline.jsonl_io import json_loads as _json_loads
 
 def filter_jsonl_by_token_length(input_file, output_file, max_tokens=500):
     kept = 0
     discarded = 0
-    with open(input_file, 'r', encoding='utf-8') as fin, \
-         open(output_file, 'w', encoding='utf-8') as fout:
+    with open(input_file, 'rb') as fin, \
+         open(output_file, 'wb') as fout:
         for line in fin:
             line = line.strip()
             if not line:
                 continue
-            obj = json.loads(line)
+            # Every line is decoded so malformed records still raise instead of being copied
+            obj = _json_loads(line)
             content = obj.get("content", "")
-            token_count = len(content.split())
-            if token_count < max_tokens:
-                json.dump(obj, fout, ensure_ascii=False)
-                fout.write('\n')
-                kept += 1
-            else:
-                discarded += 1
+            # A decoded string is never longer than its encoded bytes, so a line shorter
+            # than the budget cannot hold max_tokens tokens; keep it without splitting
+            if len(line) >= max_tokens:
+                # Only need to know whether the budget is reached, so stop splitting there
+                token_count = len(content.split(maxsplit=max_tokens))
+                if token_count >= max_tokens:
+                    discarded += 1
+                    continue
+            # Records are not modified, so write the original line back out
+            fout.write(line)
+            fout.write(b'\n')
+            kept += 1
     print(f"Kept {kept} items, discarded {discarded} items (>{max_tokens} tokens)")
 
 if __name__ == "__main__":
@@ -36,13 +36,14 @@ model = AutoModelForCausalLM.from_pretrained(
     device_map="cuda:0",
     # offload_folder="offload",
     # offload_state_dict=True, 
-    torch_dtype=torch.float16
+    torch_dtype=torch.bfloat16,  # same footprint as fp16, but small LoRA deltas don't underflow
+    low_cpu_mem_usage=True
 )
 model = PeftModel.from_pretrained(model, "/mnt/teamssd/compressed_LLM_tbricks/finetune_starcoder2_combinedThree/checkpoint-40000/")
 model = model.merge_and_unload()
 
 merged_model_path= f"/mnt/teamssd/compressed_LLM_tbricks/starcoder2_7b_22k_ft_80EM_triple_trained_new"
-model.save_pretrained(merged_model_path)
+model.save_pretrained(merged_model_path, safe_serialization=True, max_shard_size="4GB")
 
 
 tokenizer = AutoTokenizer.from_pretrained("/mnt/teamssd/compressed_LLM_tbricks/finetune_starcoder2_combinedThree/checkpoint-40000/")
@@ -11,15 +11,28 @@ Apply middle content filtering based on the analysis showing:
 
 import json
 import re
+from collections import Counter
 from datetime import datetime
 
-def extract_fim_middle(content):
-    """Extract fim_middle content from FIM task"""
-    try:
-        match = re.search(r'<fim_middle>(.*?)(?:<|$)', content, re.DOTALL)
-        return match.group(1).strip() if match else ""
-    except:
-        return ""
+from fim_utils import extract_fim_middle_v1 as extract_fim_middle
+from jsonl_io import N_WORKERS, iter_range_lines, join_records, run_chunks
+from jsonl_io import json_dumps as _json_dumps, json_loads as _json_loads
+
+
+# Patterns are compiled once at import; the filter runs them on every line.
+_RE_ACCESS = re.compile(r'^\s*(public|private|protected)\s*:\s*$')
+# Deleting brackets, separators and ASCII whitespace leaves nothing (or only other
+# whitespace) for purely symbolic content; cheaper than ^[{}()\[\];,\s]*$
+_SYMBOL_TRANS = str.maketrans('', '', '{}()[];, \t\n\r\f\v')
+
+# Meaningful C++ patterns: function calls, assignments, return statements and
+# control structures, folded into one alternation so a single search covers them
+_MEANINGFUL_RE = re.compile(r'\w+\s*\([^)]*\)|\w+\s*=\s*|return\s+|if\s*\(|for\s*\(|while\s*\(')
+# Literal spellings of the common cases, checked first with plain substring search
+_LITERAL_TOKENS = ('return ', 'if (', 'for (', 'while (')
+
+def _is_pure_symbols(content):
+    return not content.translate(_SYMBOL_TRANS).strip()
 
 def calculate_middle_quality_score(middle_content):
     """Calculate quality score for middle content (0.0-1.0, higher is better)"""
@@ -41,22 +54,11 @@ def calculate_middle_quality_score(middle_content):
         score += 0.1
     
     # Bonus for meaningful C++ patterns
-    meaningful_patterns = [
-        r'\w+\s*\([^)]*\)',  # Function calls
-        r'\w+\s*=\s*',       # Assignments
-        r'return\s+',        # Return statements
-        r'if\s*\(',          # Control structures
-        r'for\s*\(',
-        r'while\s*\(',
-    ]
-    
-    for pattern in meaningful_patterns:
-        if re.search(pattern, content):
-            score += 0.05
-            break
+    if any(tok in content for tok in _LITERAL_TOKENS) or _MEANINGFUL_RE.search(content):
+        score += 0.05
     
     # Penalty for purely symbolic content
-    if re.match(r'^[{}\(\)\[\];,\s]*$', content):
+    if _is_pure_symbols(content):
         score -= 0.3
     
     return min(max(score, 0.0), 1.0)
@@ -68,22 +70,23 @@ def should_reject_middle(middle_content):
     
     content = middle_content.strip()
     
-    # Major problems identified in analysis:
+    # Major problems identified in analysis. Checks run cheapest first; reordering
+    # only swapped checks that cannot both match, so rejection reasons are unchanged.
     
     # 1. Incomplete comma patterns (9.4% vs 2.0% in reference)
     if content.endswith(','):
         return True, "incomplete_comma"
     
-    # 2. Standalone access specifiers (2.8%, low quality)
-    if re.match(r'^\s*(public|private|protected)\s*:\s*$', content):
-        return True, "standalone_access_specifier" 
-    
-    # 3. Too short (minimal value)
+    # 2. Too short (minimal value)
     if len(content) <= 2:
         return True, "too_short"
     
+    # 3. Standalone access specifiers (2.8%, low quality)
+    if content.endswith(':') and _RE_ACCESS.match(content):
+        return True, "standalone_access_specifier" 
+    
     # 4. Pure symbols 
-    if re.match(r'^[{}\(\)\[\];,\s]*$', content):
+    if _is_pure_symbols(content):
         return True, "pure_symbols"
     
     # 5. Incomplete scope operators
@@ -92,6 +95,52 @@ def should_reject_middle(middle_content):
     
     return False, "acceptable"
 
+def _process_chunk(args):
+    """Filter the lines starting inside the byte range [start, end) of the input file.
+
+    Returns the kept records as one JSONL bytes buffer with the chunk's stats,
+    its number of lines and no errors (see run_chunks).
+    """
+    path, start, end = args
+    stats = {'total': 0, 'kept': 0, 'rejected': 0, 'reasons': Counter()}
+    out = []
+    
+    with open(path, 'rb') as infile:
+        line_num = 0
+        for line_num, line in enumerate(iter_range_lines(infile, start, end), 1):
+            line = line.strip()
+            if not line:
+                continue
+            
+            stats['total'] += 1
+            
+            try:
+                data = _json_loads(line)
+                content = data.get('content', '')
+                
+                # Extract and check middle content
+                middle = extract_fim_middle(content)
+                should_reject, reason = should_reject_middle(middle)
+                
+                if should_reject:
+                    stats['rejected'] += 1
+                    stats['reasons'][reason] += 1
+                else:
+                    stats['kept'] += 1
+                    # Calculate and add Phase 2 quality information
+                    middle_quality_score = calculate_middle_quality_score(middle)
+                    data['quality_phase2'] = 'passed_middle_content_filter'
+                    data['quality_middle_reason'] = reason
+                    data['quality_middle_score'] = middle_quality_score
+                    out.append(_json_dumps(data))
+                    
+            except json.JSONDecodeError:
+                stats['rejected'] += 1
+                stats['reasons']['json_error'] += 1
+                continue
+    
+    return (join_records(out), stats), line_num, []
+
 def filter_dataset():
     """Apply middle content quality filtering"""
     
@@ -102,6 +151,7 @@ def filter_dataset():
     print("=" * 50)
     print(f"Input:  {input_file}")
     print(f"Output: {output_file}")
+    print(f"Workers: {N_WORKERS}")
     print(f"Start:  {datetime.now().strftime('%H:%M:%S')}")
     print()
     
@@ -109,50 +159,25 @@ def filter_dataset():
         'total': 0,
         'kept': 0,
         'rejected': 0,
-        'reasons': {}
+        'reasons': Counter()
     }
     
     try:
-        with open(input_file, 'r', encoding='utf-8') as infile, \
-             open(output_file, 'w', encoding='utf-8') as outfile:
-            
-            for line_num, line in enumerate(infile, 1):
-                
-                # Progress update
-                if line_num % 100000 == 0:
-                    rate = (stats['kept'] / stats['total'] * 100) if stats['total'] > 0 else 0
-                    print(f"Processed: {line_num:,} | Kept: {stats['kept']:,} | Rate: {rate:.1f}%")
+        with open(output_file, 'wb') as outfile:
+            def merge(chunk, lines_before, lines_done):
+                kept_lines, chunk_stats = chunk
+                outfile.write(kept_lines)
                 
-                line = line.strip()
-                if not line:
-                    continue
+                stats['total'] += chunk_stats['total']
+                stats['kept'] += chunk_stats['kept']
+                stats['rejected'] += chunk_stats['rejected']
+                stats['reasons'].update(chunk_stats['reasons'])
                 
-                stats['total'] += 1
-                
-                try:
-                    data = json.loads(line)
-                    content = data.get('content', '')
-                    
-                    # Extract and check middle content
-                    middle = extract_fim_middle(content)
-                    should_reject, reason = should_reject_middle(middle)
-                    
-                    if should_reject:
-                        stats['rejected'] += 1
-                        stats['reasons'][reason] = stats['reasons'].get(reason, 0) + 1
-                    else:
-                        stats['kept'] += 1
-                        # Calculate and add Phase 2 quality information
-                        middle_quality_score = calculate_middle_quality_score(middle)
-                        data['quality_phase2'] = 'passed_middle_content_filter'
-                        data['quality_middle_reason'] = reason
-                        data['quality_middle_score'] = middle_quality_score
-                        outfile.write(json.dumps(data, ensure_ascii=False) + '\n')
-                        
-                except json.JSONDecodeError:
-                    stats['rejected'] += 1
-                    stats['reasons']['json_error'] = stats['reasons'].get('json_error', 0) + 1
-                    continue
+                # Progress update
+                rate = (stats['kept'] / stats['total'] * 100) if stats['total'] > 0 else 0
+                print(f"Processed: {stats['total']:,} | Kept: {stats['kept']:,} | Rate: {rate:.1f}%")
+            
+            run_chunks(_process_chunk, input_file, merge)
     
     except Exception as e:
         print(f"Error: {e}")
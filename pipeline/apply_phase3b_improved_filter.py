@@ -11,33 +11,95 @@ while still improving quality through semantic and contextual filtering.
 """
 
 import json
-import re
+from collections import Counter
 from datetime import datetime
 
+import numpy as np
+
+from fim_utils import extract_fim_middle_v1, extract_fim_parts_v1
+from jsonl_io import N_WORKERS, iter_range_lines, join_records, run_chunks
+from jsonl_io import json_dumps as _json_dumps, json_loads as _json_loads
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional; the length score then runs as plain Python
+    njit = None
+
+BATCH_SIZE = 50000  # records per vectorised length check
+
+class RunStat:
+    """Running mean/std (Welford), min/max and median of a stream of values.
+
+    The median comes from a histogram of values rounded to `digits` decimals
+    (exact for integers), so memory grows with the number of distinct values
+    rather than with the number of records.
+    """
+    
+    def __init__(self, digits=None):
+        self.digits = digits
+        self.n = 0
+        self.mean = 0.0
+        self.M2 = 0.0
+        self.mn = float('inf')
+        self.mx = float('-inf')
+        self.hist = Counter()
+    
+    def update(self, x):
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.M2 += delta * (x - self.mean)
+        if x < self.mn:
+            self.mn = x
+        if x > self.mx:
+            self.mx = x
+        self.hist[x if self.digits is None else round(x, self.digits)] += 1
+    
+    def merge(self, other):
+        """Fold another RunStat into this one (Chan et al. parallel update)"""
+        if not other.n:
+            return
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        self.mean += delta * other.n / n
+        self.M2 += other.M2 + delta * delta * self.n * other.n / n
+        self.n = n
+        self.mn = min(self.mn, other.mn)
+        self.mx = max(self.mx, other.mx)
+        self.hist.update(other.hist)
+    
+    def std(self):
+        """Population standard deviation, as np.std"""
+        return (self.M2 / self.n) ** 0.5 if self.n else 0.0
+    
+    def median(self):
+        lo_rank, hi_rank = (self.n - 1) // 2, self.n // 2
+        lo = hi = None
+        seen = 0
+        for value in sorted(self.hist):
+            seen += self.hist[value]
+            if lo is None and seen > lo_rank:
+                lo = value
+            if seen > hi_rank:
+                hi = value
+                break
+        return (lo + hi) / 2
+
 def extract_fim_components(content):
     """Extract fim_prefix and fim_middle content from FIM task"""
     try:
         # Extract fim_prefix
-        prefix_match = re.search(r'<fim_prefix>(.*?)<fim_suffix>', content, re.DOTALL)
-        prefix = prefix_match.group(1).strip() if prefix_match else ""
+        prefix = extract_fim_parts_v1(content).get('prefix', '').strip()
         
-        # Extract fim_middle  
-        middle_match = re.search(r'<fim_middle>(.*?)(?:<|$)', content, re.DOTALL)
-        middle = middle_match.group(1).strip() if middle_match else ""
+        # Extract fim_middle (up to the next tag)
+        middle = extract_fim_middle_v1(content)
         
         return prefix, middle
     except:
         return "", ""
 
-def calculate_length_quality_score(prefix, middle):
-    """Calculate length-based quality score (0.0-1.0, higher is better)"""
-    if not prefix or not middle:
-        return 0.0
-    
-    prefix_len = len(prefix)
-    middle_len = len(middle)
-    ratio = middle_len / prefix_len if prefix_len > 0 else float('inf')
-    
+def length_quality_score(prefix_len, middle_len, ratio):
+    """Length-based quality score (0.0-1.0) from precomputed prefix/middle lengths"""
     score = 0.5  # Base score
     
     # Prefix length scoring
@@ -57,7 +119,6 @@ def calculate_length_quality_score(prefix, middle):
         score -= 0.2  # Poor middle length
     
     # Ratio scoring (adaptive based on prefix length)
-    optimal_ratio = None
     if prefix_len <= 150:
         optimal_ratio = 0.4
         max_good_ratio = 0.8
@@ -80,34 +141,54 @@ def calculate_length_quality_score(prefix, middle):
     
     return min(max(score, 0.0), 1.0)
 
-def should_reject_improved(prefix, middle):
-    """Improved rejection criteria based on analysis of Phase 3A issues"""
+if njit is not None:
+    # Pure arithmetic on the lengths, so the compiled version returns identical scores
+    length_quality_score = njit(cache=True)(length_quality_score)
+
+def calculate_length_quality_score(prefix, middle):
+    """Calculate length-based quality score (0.0-1.0, higher is better)"""
+    if not prefix or not middle:
+        return 0.0
+    
+    prefix_len = len(prefix)
+    middle_len = len(middle)
+    return length_quality_score(prefix_len, middle_len, middle_len / prefix_len)
+
+def evaluate_lengths(prefix, middle):
+    """Run the improved rejection criteria and length scoring in one pass.
+    
+    Returns (should_reject, reason, prefix_len, middle_len, ratio, length_score);
+    the score is only computed (non-zero) for accepted tasks.
+    """
     
     if not prefix or not middle:
-        return True, "missing_components"
+        return True, "missing_components", len(prefix), len(middle), 0.0, 0.0
     
     prefix_len = len(prefix)
     middle_len = len(middle)
-    ratio = middle_len / prefix_len if prefix_len > 0 else float('inf')
+    ratio = middle_len / prefix_len
+    
+    def reject(reason):
+        return True, reason, prefix_len, middle_len, ratio, 0.0
     
     # RELAXED CRITERIA based on validation analysis:
     
     # 1. More permissive prefix length (was 100, now 50)
     # Analysis showed 100 was too restrictive for auto-extracted data
     if prefix_len < 50:
-        return True, "prefix_too_short"
+        return reject("prefix_too_short")
     
     # 2. Keep reasonable upper bound for prefix
     if prefix_len > 5000:
-        return True, "prefix_too_long"
+        return reject("prefix_too_long")
     
     # 3. More permissive middle length (was 10, now 8)
     if middle_len < 8:
-        return True, "middle_too_short"
+        return reject("middle_too_short")
         
     # 4. Keep reasonable upper bound for middle  
     if middle_len > 400:
-        return True, "middle_too_long"
+        return reject("middle_too_long")
     
     # 5. ADAPTIVE RATIO LIMITS based on prefix length
     # Key insight: Shorter prefixes naturally have higher ratios
@@ -126,31 +207,176 @@ def should_reject_improved(prefix, middle):
         max_ratio = 0.4
     
     if ratio > max_ratio:
-        return True, f"ratio_too_large_{int(max_ratio*100)}"
+        return reject(f"ratio_too_large_{int(max_ratio*100)}")
     
     # 6. Minimum ratio check (avoid tiny completions)
     if ratio < 0.01:
-        return True, "ratio_too_small"
+        return reject("ratio_too_small")
+    
+    reason = _semantic_reject_reason(middle, prefix_len, middle_len)
+    if reason:
+        return reject(reason)
+    
+    return False, "acceptable", prefix_len, middle_len, ratio, length_quality_score(prefix_len, middle_len, ratio)
+
+def _semantic_reject_reason(middle, prefix_len, middle_len):
+    """Checks 7-9 of evaluate_lengths, for tasks that passed the length limits; None if acceptable"""
+    
+    middle_stripped = middle.strip()
     
     # 7. SEMANTIC QUALITY CHECKS
-    # Avoid incomplete tokens/words
-    if middle.strip() and middle.strip()[-1].isalnum() and ' ' not in middle.strip():
-        # Single incomplete word
-        if len(middle.strip()) < 15:  # Allow longer single tokens
-            return True, "incomplete_word"
+    # Avoid incomplete tokens/words: a single short word (longer single tokens are allowed)
+    # Cheapest tests first: a length compare, then one memchr-style scan, then the last char
+    if 0 < len(middle_stripped) < 15 and ' ' not in middle_stripped and middle_stripped[-1].isalnum():
+        return "incomplete_word"
     
     # 8. CONTEXTUAL QUALITY
     # Very short prefix with very long middle (suspicious)
     if prefix_len < 80 and middle_len > 200:
-        return True, "short_prefix_very_long_middle"
+        return "short_prefix_very_long_middle"
     
     # 9. WHITESPACE QUALITY
     # Avoid completions that are mostly whitespace
-    middle_stripped = middle.strip()
-    if len(middle_stripped) < len(middle) * 0.3:  # More than 70% whitespace
-        return True, "mostly_whitespace"
+    if len(middle_stripped) < middle_len * 0.3:  # More than 70% whitespace
+        return "mostly_whitespace"
     
-    return False, "acceptable"
+    return None
+
+# Reasons for checks 1-6 of evaluate_lengths, indexed like the rows of length_gate's mask
+_LENGTH_REASONS = ("prefix_too_short", "prefix_too_long", "middle_too_short", "middle_too_long",
+                   None, "ratio_too_small")
+_RATIO_REASONS = {max_ratio: f"ratio_too_large_{int(max_ratio*100)}" for max_ratio in (1.2, 0.8, 0.6, 0.4)}
+
+def length_gate(prefix_lens, middle_lens):
+    """Vectorised checks 1-6 of evaluate_lengths for a batch of non-empty prefix/middle lengths.
+    
+    Returns (ratios, reasons) as lists; a reason is None when the task passes
+    every length and ratio limit.
+    """
+    pl = np.asarray(prefix_lens, dtype=np.int64)
+    ml = np.asarray(middle_lens, dtype=np.int64)
+    ratio = ml / pl
+    max_ratio = np.select([pl <= 150, pl <= 300, pl <= 500], [1.2, 0.8, 0.6], default=0.4)
+    
+    failed = np.stack([pl < 50, pl > 5000, ml < 8, ml > 400, ratio > max_ratio, ratio < 0.01])
+    first_failed = np.where(failed.any(axis=0), failed.argmax(axis=0), -1)
+    
+    reasons = [None if i < 0 else _LENGTH_REASONS[i] or _RATIO_REASONS[m]
+               for i, m in zip(first_failed.tolist(), max_ratio.tolist())]
+    return ratio.tolist(), reasons
+
+def should_reject_improved(prefix, middle):
+    """Improved rejection criteria based on analysis of Phase 3A issues"""
+    return evaluate_lengths(prefix, middle)[:2]
+
+def _may_have_components(raw_line):
+    """False when a raw JSONL line certainly has no fim prefix or no fim middle.
+    
+    Tags are searched in the encoded bytes, which is only conclusive while '<'
+    is not written as a \\u escape. Only called on lines that decoded; values
+    other than a JSON object are left to the regular path.
+    """
+    if not (raw_line.startswith(b'{') and raw_line.endswith(b'}')):
+        return True
+    if b'\\u003c' in raw_line or b'\\u003C' in raw_line:
+        return True
+    p = raw_line.find(b'<fim_prefix>')
+    if p == -1 or raw_line.find(b'<fim_suffix>', p) == -1:
+        return False
+    return b'<fim_middle>' in raw_line
+
+def _process_chunk(args):
+    """Filter the lines starting inside the byte range [start, end) of the input file.
+
+    Returns the kept records as one JSONL bytes buffer with the chunk's stats and the
+    RunStats of the accepted tasks' prefix lengths, middle lengths and ratios, plus
+    the chunk's number of lines and no errors (see run_chunks).
+    """
+    path, start, end = args
+    stats = {'total': 0, 'kept': 0, 'rejected': 0, 'reasons': Counter()}
+    prefix_lengths = RunStat()
+    middle_lengths = RunStat()
+    ratios = RunStat(digits=4)
+    out = []
+    
+    def flush(batch):
+        # Length limits for the whole batch at once; only survivors get the per-task checks
+        complete = [i for i, (_, prefix, middle) in enumerate(batch) if prefix and middle]
+        batch_ratios, length_reasons = length_gate([len(batch[i][1]) for i in complete],
+                                                   [len(batch[i][2]) for i in complete])
+        gated = dict(zip(complete, zip(batch_ratios, length_reasons)))
+        
+        for i, (data, prefix, middle) in enumerate(batch):
+            if i not in gated:
+                reason = "missing_components"
+            else:
+                prefix_len = len(prefix)
+                middle_len = len(middle)
+                ratio, reason = gated[i]
+                if reason is None:
+                    reason = _semantic_reject_reason(middle, prefix_len, middle_len)
+            
+            if reason:
+                stats['rejected'] += 1
+                stats['reasons'][reason] += 1
+                continue
+            
+            stats['kept'] += 1
+            
+            # Add Phase 3B quality information
+            data['quality_phase3b'] = 'passed_length_based_filter'
+            data['quality_length_reason'] = "acceptable"
+            data['quality_length_score'] = length_quality_score(prefix_len, middle_len, ratio)
+            data['quality_prefix_length'] = prefix_len
+            data['quality_middle_length'] = middle_len
+            data['quality_ratio'] = ratio
+            
+            out.append(_json_dumps(data))
+            
+            prefix_lengths.update(prefix_len)
+            middle_lengths.update(middle_len)
+            ratios.update(ratio)
+    
+    # Bind per-record callables to locals; the loop body runs once per line
+    json_loads = _json_loads
+    may_have_components = _may_have_components
+    reasons = stats['reasons']
+    
+    batch = []
+    batch_append = batch.append
+    with open(path, 'rb') as infile:
+        line_num = 0
+        for line_num, line in enumerate(iter_range_lines(infile, start, end), 1):
+            line = line.strip()
+            if not line:
+                continue
+            
+            stats['total'] += 1
+            
+            try:
+                data = json_loads(line)
+            except json.JSONDecodeError:
+                stats['rejected'] += 1
+                reasons['json_error'] += 1
+                continue
+            
+            # A line that cannot hold both components skips extraction and batching
+            if not may_have_components(line):
+                stats['rejected'] += 1
+                reasons['missing_components'] += 1
+                continue
+            
+            # Extract components
+            prefix, middle = extract_fim_components(data.get('content', ''))
+            batch_append((data, prefix, middle))
+            if len(batch) >= BATCH_SIZE:
+                flush(batch)
+                batch.clear()
+    
+    if batch:
+        flush(batch)
+    
+    return (join_records(out), stats, (prefix_lengths, middle_lengths, ratios)), line_num, []
 
 def filter_phase3b():
     """Apply improved Phase 3B filtering"""
@@ -162,6 +388,7 @@ def filter_phase3b():
     print("=" * 60)
     print(f"Input:  {input_file}")
     print(f"Output: {output_file}")
+    print(f"Workers: {N_WORKERS}")
     print(f"Start:  {datetime.now().strftime('%H:%M:%S')}")
     
     print(f"\n🔧 IMPROVED FILTERING CRITERIA:")
@@ -179,65 +406,34 @@ def filter_phase3b():
         'total': 0,
         'kept': 0,
         'rejected': 0,
-        'reasons': {}
+        'reasons': Counter()
     }
     
-    prefix_lengths = []
-    middle_lengths = []
-    ratios = []
+    prefix_lengths = RunStat()
+    middle_lengths = RunStat()
+    ratios = RunStat(digits=4)
     
     try:
-        with open(input_file, 'r', encoding='utf-8') as infile, \
-             open(output_file, 'w', encoding='utf-8') as outfile:
-            
-            for line_num, line in enumerate(infile, 1):
-                
-                # Progress update
-                if line_num % 100000 == 0:
-                    rate = (stats['kept'] / stats['total'] * 100) if stats['total'] > 0 else 0
-                    print(f"Processed: {line_num:,} | Kept: {stats['kept']:,} | Rate: {rate:.1f}%")
+        with open(output_file, 'wb') as outfile:
+            def merge(chunk, lines_before, lines_done):
+                kept_lines, chunk_stats, chunk_lengths = chunk
+                outfile.write(kept_lines)
                 
-                line = line.strip()
-                if not line:
-                    continue
+                stats['total'] += chunk_stats['total']
+                stats['kept'] += chunk_stats['kept']
+                stats['rejected'] += chunk_stats['rejected']
+                stats['reasons'].update(chunk_stats['reasons'])
                 
-                stats['total'] += 1
+                # Track accepted statistics
+                prefix_lengths.merge(chunk_lengths[0])
+                middle_lengths.merge(chunk_lengths[1])
+                ratios.merge(chunk_lengths[2])
                 
-                try:
-                    data = json.loads(line)
-                    content = data.get('content', '')
-                    
-                    # Extract components
-                    prefix, middle = extract_fim_components(content)
-                    should_reject, reason = should_reject_improved(prefix, middle)
-                    
-                    if should_reject:
-                        stats['rejected'] += 1
-                        stats['reasons'][reason] = stats['reasons'].get(reason, 0) + 1
-                    else:
-                        stats['kept'] += 1
-                        
-                        # Calculate and add Phase 3B quality information
-                        length_quality_score = calculate_length_quality_score(prefix, middle)
-                        data['quality_phase3b'] = 'passed_length_based_filter'
-                        data['quality_length_reason'] = reason
-                        data['quality_length_score'] = length_quality_score
-                        data['quality_prefix_length'] = len(prefix)
-                        data['quality_middle_length'] = len(middle)
-                        data['quality_ratio'] = len(middle) / len(prefix) if len(prefix) > 0 else 0.0
-                        
-                        outfile.write(json.dumps(data, ensure_ascii=False) + '\n')
-                        
-                        # Track accepted statistics
-                        prefix_lengths.append(len(prefix))
-                        middle_lengths.append(len(middle))
-                        if len(prefix) > 0:
-                            ratios.append(len(middle) / len(prefix))
-                        
-                except json.JSONDecodeError:
-                    stats['rejected'] += 1
-                    stats['reasons']['json_error'] = stats['reasons'].get('json_error', 0) + 1
-                    continue
+                # Progress update
+                rate = (stats['kept'] / stats['total'] * 100) if stats['total'] > 0 else 0
+                print(f"Processed: {stats['total']:,} | Kept: {stats['kept']:,} | Rate: {rate:.1f}%")
+            
+            run_chunks(_process_chunk, input_file, merge)
     
     except Exception as e:
         print(f"Error: {e}")
@@ -264,26 +460,24 @@ def filter_phase3b():
         print(f"{reason:<30} {count:>8,} ({pct:>5.1f}%)")
     
     # Statistics of accepted data
-    if prefix_lengths:
-        import numpy as np
-        
+    if prefix_lengths.n:
         print(f"\n📊 ACCEPTED DATA CHARACTERISTICS:")
         print("-" * 40)
         print(f"Prefix lengths:")
-        print(f"  Mean: {np.mean(prefix_lengths):.1f} ± {np.std(prefix_lengths):.1f}")
-        print(f"  Range: {min(prefix_lengths)}-{max(prefix_lengths)}")
-        print(f"  Median: {np.median(prefix_lengths):.1f}")
+        print(f"  Mean: {prefix_lengths.mean:.1f} ± {prefix_lengths.std():.1f}")
+        print(f"  Range: {prefix_lengths.mn}-{prefix_lengths.mx}")
+        print(f"  Median: {prefix_lengths.median():.1f}")
         
         print(f"\nMiddle lengths:")
-        print(f"  Mean: {np.mean(middle_lengths):.1f} ± {np.std(middle_lengths):.1f}")
-        print(f"  Range: {min(middle_lengths)}-{max(middle_lengths)}")
-        print(f"  Median: {np.median(middle_lengths):.1f}")
+        print(f"  Mean: {middle_lengths.mean:.1f} ± {middle_lengths.std():.1f}")
+        print(f"  Range: {middle_lengths.mn}-{middle_lengths.mx}")
+        print(f"  Median: {middle_lengths.median():.1f}")
         
-        if ratios:
+        if ratios.n:
             print(f"\nMiddle/Prefix ratios:")
-            print(f"  Mean: {np.mean(ratios):.3f} ± {np.std(ratios):.3f}")
-            print(f"  Range: {min(ratios):.3f}-{max(ratios):.3f}")
-            print(f"  Median: {np.median(ratios):.3f}")
+            print(f"  Mean: {ratios.mean:.3f} ± {ratios.std():.3f}")
+            print(f"  Range: {ratios.mn:.3f}-{ratios.mx:.3f}")
+            print(f"  Median: {ratios.median():.3f}")
     
     # Dataset progression summary
     print(f"\n📈 DATASET PROGRESSION:")
@@ -11,31 +11,98 @@ integrating all three phases of quality assessment:
 Final output includes all individual scores plus a composite quality score.
 """
 
+import functools
 import json
+from array import array
 import re
 from datetime import datetime
-from typing import Dict, Tuple
+from typing import Dict, Optional, Tuple
 
-def extract_fim_parts(content: str) -> Dict[str, str]:
-    """Extract prefix, suffix, and middle from FIM content"""
-    parts = {}
-    
-    # Extract prefix
-    prefix_match = re.search(r'<fim_prefix>(.*?)<fim_suffix>', content, re.DOTALL)
-    if prefix_match:
-        parts['prefix'] = prefix_match.group(1)
-    
-    # Extract suffix (usually empty in our case)
-    suffix_match = re.search(r'<fim_suffix>(.*?)<fim_middle>', content, re.DOTALL)
-    if suffix_match:
-        parts['suffix'] = suffix_match.group(1)
-    
-    # Extract middle
-    middle_match = re.search(r'<fim_middle>(.*?)$', content, re.DOTALL)
-    if middle_match:
-        parts['middle'] = middle_match.group(1)
-    
-    return parts
+from fim_utils import extract_fim_parts_v1 as extract_fim_parts
+from jsonl_io import N_WORKERS, iter_range_lines, join_records, run_chunks
+from jsonl_io import json_dumps as _json_dumps, json_loads as _json_loads
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional; the length score then runs as plain Python
+    njit = None
+
+MIDDLE_CACHE_MAX_LEN = 512  # longer middles are rarely repeated and would bloat the cache
+
+# Patterns are compiled once at import; alternations are only used where the
+# original code stopped at the first matching pattern anyway.
+_DOMAIN_TB_RE = re.compile(r'\bTB[A-Z]+\b')
+
+_PHASE2_MEANINGFUL_RE = re.compile(
+    r'\w+\s*\([^)]*\)'   # Function calls
+    r'|\w+\s*=\s*'        # Assignments
+    r'|return\s+'          # Return statements
+    r'|if\s*\('            # Control structures
+    r'|for\s*\('
+    r'|while\s*\('
+)
+_PURE_SYMBOLS_RE = re.compile(r'^[{}\(\)\[\];,\s]*$')
+
+_ONLY_PUNCTUATION_RE = re.compile(r'^[\s\{\}\[\]\(\);,\.]+$')
+_ONLY_CLOSING_BRACES_RE = re.compile(r'^[\s}]+$')
+_MEANINGLESS_RE = re.compile(
+    r'(?:^[;,]+$'                    # Just punctuation
+    r'|^\s*\)\s*[;{]*\s*$'         # Just closing parentheses
+    r'|^\s*else\s*$'                # Standalone else
+    r'|^\s*\+\+\s*$'               # Just increment
+    r'|^\s*--\s*$)'                 # Just decrement
+)
+_MEANINGFUL_RE = re.compile(
+    r'\w+\s*\([^)]*\)'     # Function calls
+    r'|class\s+\w+'         # Class definitions
+    r'|struct\s+\w+'        # Struct definitions
+    r'|\w+\s*=\s*\w+'       # Assignments
+    r'|if\s*\('             # Control structures
+    r'|for\s*\('
+    r'|while\s*\('
+    r'|return\s+'           # Return statements
+    r'|#include\s*[<"]'     # Include statements
+    r'|using\s+namespace'   # Using declarations
+    r'|public:|private:|protected:'  # Access specifiers
+    r'|\w+::\w+'            # Scope resolution
+)
+
+# Keyword checks are spelled out as chained `in` tests: for a handful of short
+# literals on typical middles (a few dozen characters) that is cheaper than a
+# generator over a list or a regex alternation; the regex only wins on middles of
+# several hundred characters, which are rare.
+_LOGICAL_CONTINUATIONS = [
+    # After includes, expect more includes, namespace, or declarations
+    (re.compile(r'#include\s*[<"]'), lambda m: '#include' in m or 'namespace' in m or 'using' in m),
+    
+    # After namespace declaration, expect opening brace or content
+    (re.compile(r'namespace\s+\w+'), lambda m: '{' in m or 'class' in m or 'struct' in m or 'enum' in m or 'void' in m or 'int' in m),
+    
+    # After class/struct declaration, expect opening brace or inheritance
+    (re.compile(r'(class|struct)\s+\w+'), lambda m: '{' in m or ':' in m or 'public' in m or 'private' in m),
+    
+    # After function signature, expect opening brace or implementation
+    (re.compile(r'\w+\s*\([^)]*\)\s*(const)?\s*$'), lambda m: '{' in m or 'return' in m or 'if' in m or 'for' in m or 'while' in m),
+    
+    # After access specifiers, expect declarations
+    (re.compile(r'(public|private|protected)\s*:'), lambda m: 'void' in m or 'int' in m or 'double' in m or 'virtual' in m or 'static' in m or 'const' in m),
+]
+# One scan over the last prefix line tells whether any continuation rule can apply
+_ANY_CONTINUATION_RE = re.compile('|'.join(f'(?:{pattern.pattern})' for pattern, _ in _LOGICAL_CONTINUATIONS))
+
+_MEANINGFUL_START_RE = re.compile(
+    r'(?:#include'          # Include statements
+    r'|#pragma'            # Pragma directives
+    r'|#ifndef'            # Header guards
+    r'|#ifdef'
+    r'|#define'
+    r'|namespace\s+'       # Namespace declarations
+    r'|using\s+'           # Using declarations
+    r'|class\s+'           # Class declarations
+    r'|struct\s+'          # Struct declarations
+    r'|enum\s+)'           # Enum declarations
+)
+_FUNCTION_DECL_START_RE = re.compile(r'^[\w:<>~]+.*\w+\s*\([^)]*\)')
 
 def calculate_phase1_score(parts: Dict[str, str]) -> float:
     """Calculate Phase 1 context quality score (0.0-1.0)"""
@@ -46,40 +113,49 @@ def calculate_phase1_score(parts: Dict[str, str]) -> float:
     if not starts_with_complete_code_line(prefix):
         return 0.0
     
+    middle_stripped = middle.strip()
+    return phase1_score_from_checks(
+        middle, middle_stripped,
+        is_meaningful_code_completion(middle, prefix, middle_stripped),
+        has_logical_context_flow(prefix, middle, suffix, middle_stripped),
+    )
+
+def phase1_score_from_checks(middle: str, middle_stripped: str, meaningful: bool, logical_flow: bool) -> float:
+    """Phase 1 score for a task whose prefix starts with a complete code line"""
     score = 0.0
     
     # Base score for meaningful completion
-    if is_meaningful_code_completion(middle, prefix):
+    if meaningful:
         score += 0.4
     
     # Bonus for logical context flow
-    if has_logical_context_flow(prefix, middle, suffix):
+    if logical_flow:
         score += 0.2
     
     # Bonus for appropriate length
-    middle_len = len(middle.strip())
+    middle_len = len(middle_stripped)
     if 10 <= middle_len <= 200:
         score += 0.2
     elif 5 <= middle_len <= 300:
         score += 0.1
     
     # Bonus for domain-specific content
-    if 'tbricks' in middle.lower() or re.search(r'\bTB[A-Z]+\b', middle):
+    if 'tbricks' in middle.lower() or _DOMAIN_TB_RE.search(middle):
         score += 0.1
     
     # Bonus for meaningful C++ constructs
-    meaningful_constructs = ['class', 'struct', 'namespace', 'public:', 'private:', 'virtual', 'const']
-    if any(construct in middle for construct in meaningful_constructs):
+    if ('class' in middle or 'struct' in middle or 'namespace' in middle or 'public:' in middle or
+            'private:' in middle or 'virtual' in middle or 'const' in middle):
         score += 0.1
     
     return min(score, 1.0)
 
-def calculate_phase2_score(middle: str) -> float:
+def calculate_phase2_score(middle: str, middle_stripped: Optional[str] = None) -> float:
     """Calculate Phase 2 middle content quality score (0.0-1.0)"""
     if not middle:
         return 0.0
     
-    content = middle.strip()
+    content = middle.strip() if middle_stripped is None else middle_stripped
     score = 0.6  # Base score for non-empty content
     
     # Bonus for appropriate length
@@ -94,22 +170,11 @@ def calculate_phase2_score(middle: str) -> float:
         score += 0.1
     
     # Bonus for meaningful C++ patterns
-    meaningful_patterns = [
-        r'\w+\s*\([^)]*\)',  # Function calls
-        r'\w+\s*=\s*',       # Assignments
-        r'return\s+',        # Return statements
-        r'if\s*\(',          # Control structures
-        r'for\s*\(',
-        r'while\s*\(',
-    ]
-    
-    for pattern in meaningful_patterns:
-        if re.search(pattern, content):
-            score += 0.05
-            break
+    if _PHASE2_MEANINGFUL_RE.search(content):
+        score += 0.05
     
     # Penalty for purely symbolic content
-    if re.match(r'^[{}\(\)\[\];,\s]*$', content):
+    if _PURE_SYMBOLS_RE.match(content):
         score -= 0.3
     
     return min(max(score, 0.0), 1.0)
@@ -121,8 +186,10 @@ def calculate_phase3_score(prefix: str, middle: str) -> float:
     
     prefix_len = len(prefix)
     middle_len = len(middle)
-    ratio = middle_len / prefix_len if prefix_len > 0 else float('inf')
-    
+    return phase3_score_from_lengths(prefix_len, middle_len, middle_len / prefix_len)
+
+def phase3_score_from_lengths(prefix_len: int, middle_len: int, ratio: float) -> float:
+    """Phase 3 score from precomputed lengths (prefix_len > 0, middle_len > 0)"""
     score = 0.5  # Base score
     
     # Prefix length scoring
@@ -164,105 +231,63 @@ def calculate_phase3_score(prefix: str, middle: str) -> float:
     
     return min(max(score, 0.0), 1.0)
 
+if njit is not None:
+    # Pure arithmetic on the lengths, so the compiled version returns identical scores
+    phase3_score_from_lengths = njit(cache=True)(phase3_score_from_lengths)
+
 def calculate_composite_score(phase1_score: float, phase2_score: float, phase3_score: float) -> float:
     """Calculate composite quality score weighted across all phases"""
-    # Weighted average: Phase 1 is most important (context), then Phase 2 (content), then Phase 3 (length)
-    weights = {'phase1': 0.5, 'phase2': 0.3, 'phase3': 0.2}
-    
-    composite = (
-        weights['phase1'] * phase1_score +
-        weights['phase2'] * phase2_score + 
-        weights['phase3'] * phase3_score
-    )
-    
-    return min(max(composite, 0.0), 1.0)
+    # Weighted average: Phase 1 is most important (context), then Phase 2 (content), then Phase 3 (length).
+    # The weights sum to 1 and every phase score is already in [0, 1], so no clamping is needed.
+    return 0.5 * phase1_score + 0.3 * phase2_score + 0.2 * phase3_score
 
 # Import helper functions from the original filter
-def is_meaningful_code_completion(middle: str, prefix: str) -> bool:
+def is_meaningful_code_completion(middle: str, prefix: str, middle_stripped: Optional[str] = None) -> bool:
     """Judge if the middle part represents a meaningful, feasible auto-completion"""
     
-    if not middle or not middle.strip():
+    if not middle:
         return False
     
-    middle_stripped = middle.strip()
+    if middle_stripped is None:
+        middle_stripped = middle.strip()
+    if not middle_stripped:
+        return False
     
     # Reject if middle is too short (less than 5 characters after stripping)
     if len(middle_stripped) < 5:
         return False
     
     # Reject if middle is only symbols/punctuation
-    if re.match(r'^[\s\{\}\[\]\(\);,\.]+$', middle_stripped):
+    if _ONLY_PUNCTUATION_RE.match(middle_stripped):
         return False
     
     # Reject if middle is just a closing brace or return statement without content
-    if re.match(r'^[\s}]+$', middle_stripped) or middle_stripped == 'return;':
+    if _ONLY_CLOSING_BRACES_RE.match(middle_stripped) or middle_stripped == 'return;':
         return False
     
     # Reject incomplete or meaningless fragments
-    meaningless_patterns = [
-        r'^[;,]+$',                    # Just punctuation
-        r'^\s*\)\s*[;{]*\s*$',        # Just closing parentheses
-        r'^\s*else\s*$',               # Standalone else
-        r'^\s*\+\+\s*$',               # Just increment
-        r'^\s*--\s*$',                 # Just decrement
-    ]
-    
-    for pattern in meaningless_patterns:
-        if re.match(pattern, middle_stripped):
-            return False
+    if _MEANINGLESS_RE.match(middle_stripped):
+        return False
     
     # Accept meaningful C++ constructs
-    meaningful_patterns = [
-        r'\w+\s*\([^)]*\)',  # Function calls
-        r'class\s+\w+',      # Class definitions
-        r'struct\s+\w+',     # Struct definitions
-        r'\w+\s*=\s*\w+',    # Assignments
-        r'if\s*\(',          # Control structures
-        r'for\s*\(',
-        r'while\s*\(',
-        r'return\s+',        # Return statements
-        r'#include\s*[<"]',  # Include statements
-        r'using\s+namespace', # Using declarations
-        r'public:', r'private:', r'protected:', # Access specifiers
-        r'\w+::\w+',         # Scope resolution
-    ]
-    
-    for pattern in meaningful_patterns:
-        if re.search(pattern, middle_stripped):
-            return True
+    if _MEANINGFUL_RE.search(middle_stripped):
+        return True
     
     return False
 
-def has_logical_context_flow(prefix: str, middle: str, suffix: str) -> bool:
+def has_logical_context_flow(prefix: str, middle: str, suffix: str, middle_stripped: Optional[str] = None) -> bool:
     """Check if the middle logically follows from the prefix context"""
     
-    prefix_lines = prefix.strip().split('\n')
-    if not prefix_lines:
-        return False
+    last_prefix_line = prefix.strip().rsplit('\n', 1)[-1].strip()
+    if not _ANY_CONTINUATION_RE.search(last_prefix_line):
+        return True  # Default to accepting if no specific pattern matched
     
-    last_prefix_line = prefix_lines[-1].strip()
-    middle_stripped = middle.strip()
+    if middle_stripped is None:
+        middle_stripped = middle.strip()
     
     # Check for logical continuations
-    logical_continuations = [
-        # After includes, expect more includes, namespace, or declarations
-        (r'#include\s*[<"]', lambda m: '#include' in m or 'namespace' in m or 'using' in m),
-        
-        # After namespace declaration, expect opening brace or content
-        (r'namespace\s+\w+', lambda m: '{' in m or any(kw in m for kw in ['class', 'struct', 'enum', 'void', 'int'])),
-        
-        # After class/struct declaration, expect opening brace or inheritance
-        (r'(class|struct)\s+\w+', lambda m: '{' in m or ':' in m or 'public' in m or 'private' in m),
-        
-        # After function signature, expect opening brace or implementation
-        (r'\w+\s*\([^)]*\)\s*(const)?\s*$', lambda m: '{' in m or any(kw in m for kw in ['return', 'if', 'for', 'while'])),
-        
-        # After access specifiers, expect declarations
-        (r'(public|private|protected)\s*:', lambda m: any(kw in m for kw in ['void', 'int', 'double', 'virtual', 'static', 'const'])),
-    ]
-    
-    for pattern, check_func in logical_continuations:
-        if re.search(pattern, last_prefix_line):
+    for pattern, check_func in _LOGICAL_CONTINUATIONS:
+        if pattern.search(last_prefix_line):
             if check_func(middle_stripped):
                 return True
     
@@ -291,29 +316,144 @@ def starts_with_complete_code_line(prefix: str) -> bool:
         return False
     
     # Accept meaningful starting patterns
-    meaningful_starts = [
-        r'^#include',          # Include statements
-        r'^#pragma',           # Pragma directives
-        r'^#ifndef',           # Header guards
-        r'^#ifdef',
-        r'^#define',
-        r'^namespace\s+',      # Namespace declarations
-        r'^using\s+',          # Using declarations
-        r'^class\s+',          # Class declarations
-        r'^struct\s+',         # Struct declarations
-        r'^enum\s+',           # Enum declarations
-    ]
-    
-    for pattern in meaningful_starts:
-        if re.match(pattern, first_line):
-            return True
+    if _MEANINGFUL_START_RE.match(first_line):
+        return True
     
     # Accept complete function declarations
-    if re.match(r'^[\w:<>~]+.*\w+\s*\([^)]*\)', first_line):
+    if _FUNCTION_DECL_START_RE.match(first_line):
         return True
     
     return False
 
+def _middle_checks(middle: str) -> Tuple[str, bool, float]:
+    """The checks that depend on the middle alone: (middle_stripped, is_meaningful, phase2_score)"""
+    middle_stripped = middle.strip()
+    # is_meaningful_code_completion does not look at the prefix
+    return (middle_stripped,
+            is_meaningful_code_completion(middle, '', middle_stripped),
+            calculate_phase2_score(middle, middle_stripped))
+
+_middle_checks_cached = functools.lru_cache(maxsize=65536)(_middle_checks)
+
+def _process_chunk(args):
+    """Score the lines starting inside the byte range [start, end) of the input file.
+
+    Returns the enhanced records as one JSONL bytes buffer with the chunk's stats,
+    its number of lines and its errors (see run_chunks).
+    """
+    path, start, end = args
+    stats = {
+        'total': 0,
+        'processed': 0,
+        # Packed C doubles (8 bytes per score instead of a float object plus list slot)
+        'phase1_scores': array('d'),
+        'phase2_scores': array('d'),
+        'phase3_scores': array('d'),
+        'composite_scores': array('d')
+    }
+    out = []
+    errors = []
+    
+    # Bind per-record callables to locals; the loop body runs once per task
+    json_loads = _json_loads
+    json_dumps = _json_dumps
+    out_append = out.append
+    phase1_append = stats['phase1_scores'].append
+    phase2_append = stats['phase2_scores'].append
+    phase3_append = stats['phase3_scores'].append
+    composite_append = stats['composite_scores'].append
+    
+    with open(path, 'rb') as infile:
+        line_num = 0
+        for line_num, line in enumerate(iter_range_lines(infile, start, end), 1):
+            line = line.strip()
+            if not line:
+                continue
+            
+            stats['total'] += 1
+            
+            try:
+                data = json_loads(line)
+                content = data.get('content', '')
+                
+                # Extract FIM parts
+                parts = extract_fim_parts(content)
+                
+                if not all(key in parts for key in ['prefix', 'middle']):
+                    continue
+                
+                prefix = parts['prefix']
+                middle = parts['middle']
+                
+                prefix_len = len(prefix)
+                middle_len = len(middle)
+                ratio = middle_len / prefix_len if prefix_len > 0 else 0.0
+                
+                # Each check runs once and feeds both the scores and the metrics
+                # Short completions (closing braces, returns, ...) repeat across tasks, so memoize them
+                if len(middle) < MIDDLE_CACHE_MAX_LEN:
+                    middle_stripped, has_meaningful_completion, phase2_score = _middle_checks_cached(middle)
+                else:
+                    middle_stripped, has_meaningful_completion, phase2_score = _middle_checks(middle)
+                has_complete_prefix = starts_with_complete_code_line(prefix)
+                has_logical_flow = has_logical_context_flow(prefix, middle, parts.get('suffix', ''), middle_stripped)
+                
+                # Calculate all quality scores
+                if has_complete_prefix:
+                    phase1_score = phase1_score_from_checks(middle, middle_stripped, has_meaningful_completion, has_logical_flow)
+                else:
+                    phase1_score = 0.0
+                phase3_score = phase3_score_from_lengths(prefix_len, middle_len, ratio) if prefix_len and middle_len else 0.0
+                composite_score = 0.5 * phase1_score + 0.3 * phase2_score + 0.2 * phase3_score  # calculate_composite_score, inlined
+                
+                # Add comprehensive quality information to task
+                data['quality_scores'] = {
+                    'phase1_context_quality': phase1_score,
+                    'phase2_middle_quality': phase2_score,
+                    'phase3_length_quality': phase3_score,
+                    'composite_quality': composite_score
+                }
+                
+                # Add detailed metrics
+                data['quality_metrics'] = {
+                    'prefix_length': prefix_len,
+                    'middle_length': middle_len,
+                    'ratio': ratio,
+                    'has_complete_prefix': has_complete_prefix,
+                    'has_meaningful_completion': has_meaningful_completion,
+                    'has_logical_flow': has_logical_flow
+                }
+                
+                # Add quality tier classification
+                if composite_score >= 0.8:
+                    quality_tier = 'high_quality'
+                elif composite_score >= 0.6:
+                    quality_tier = 'medium_quality'
+                elif composite_score >= 0.4:
+                    quality_tier = 'acceptable_quality'
+                else:
+                    quality_tier = 'low_quality'
+                
+                data['quality_tier'] = quality_tier
+                
+                # Track statistics
+                phase1_append(phase1_score)
+                phase2_append(phase2_score)
+                phase3_append(phase3_score)
+                composite_append(composite_score)
+                stats['processed'] += 1
+                
+                # Write enhanced task
+                out_append(json_dumps(data))
+                
+            except json.JSONDecodeError:
+                continue
+            except Exception as e:
+                errors.append(("Error processing line", line_num, str(e)))
+                continue
+    
+    return (join_records(out), stats), line_num, errors
+
 def process_dataset_with_comprehensive_scores():
     """Process dataset and add comprehensive quality scores"""
     
@@ -325,98 +465,35 @@ def process_dataset_with_comprehensive_scores():
     print("=" * 60)
     print(f"Input:  {input_file}")
     print(f"Output: {output_file}")
+    print(f"Workers: {N_WORKERS}")
     print(f"Start:  {datetime.now().strftime('%H:%M:%S')}")
     print()
     
     stats = {
         'total': 0,
         'processed': 0,
-        'phase1_scores': [],
-        'phase2_scores': [],
-        'phase3_scores': [],
-        'composite_scores': []
+        # Packed C doubles (8 bytes per score instead of a float object plus list slot)
+        'phase1_scores': array('d'),
+        'phase2_scores': array('d'),
+        'phase3_scores': array('d'),
+        'composite_scores': array('d')
     }
     
     try:
-        with open(input_file, 'r', encoding='utf-8') as infile, \
-             open(output_file, 'w', encoding='utf-8') as outfile:
-            
-            for line_num, line in enumerate(infile, 1):
-                
-                # Progress update
-                if line_num % 50000 == 0:
-                    print(f"Processed: {line_num:,} tasks")
-                
-                line = line.strip()
-                if not line:
-                    continue
+        with open(output_file, 'wb') as outfile:
+            def merge(chunk, lines_before, lines_done):
+                enhanced_lines, chunk_stats = chunk
+                outfile.write(enhanced_lines)
                 
-                stats['total'] += 1
+                stats['total'] += chunk_stats['total']
+                stats['processed'] += chunk_stats['processed']
+                for key in ('phase1_scores', 'phase2_scores', 'phase3_scores', 'composite_scores'):
+                    stats[key].extend(chunk_stats[key])
                 
-                try:
-                    data = json.loads(line)
-                    content = data.get('content', '')
-                    
-                    # Extract FIM parts
-                    parts = extract_fim_parts(content)
-                    
-                    if not all(key in parts for key in ['prefix', 'middle']):
-                        continue
-                    
-                    prefix = parts['prefix']
-                    middle = parts['middle']
-                    
-                    # Calculate all quality scores
-                    phase1_score = calculate_phase1_score(parts)
-                    phase2_score = calculate_phase2_score(middle)
-                    phase3_score = calculate_phase3_score(prefix, middle)
-                    composite_score = calculate_composite_score(phase1_score, phase2_score, phase3_score)
-                    
-                    # Add comprehensive quality information to task
-                    data['quality_scores'] = {
-                        'phase1_context_quality': phase1_score,
-                        'phase2_middle_quality': phase2_score,
-                        'phase3_length_quality': phase3_score,
-                        'composite_quality': composite_score
-                    }
-                    
-                    # Add detailed metrics
-                    data['quality_metrics'] = {
-                        'prefix_length': len(prefix),
-                        'middle_length': len(middle),
-                        'ratio': len(middle) / len(prefix) if len(prefix) > 0 else 0.0,
-                        'has_complete_prefix': starts_with_complete_code_line(prefix),
-                        'has_meaningful_completion': is_meaningful_code_completion(middle, prefix),
-                        'has_logical_flow': has_logical_context_flow(prefix, middle, parts.get('suffix', ''))
-                    }
-                    
-                    # Add quality tier classification
-                    if composite_score >= 0.8:
-                        quality_tier = 'high_quality'
-                    elif composite_score >= 0.6:
-                        quality_tier = 'medium_quality'
-                    elif composite_score >= 0.4:
-                        quality_tier = 'acceptable_quality'
-                    else:
-                        quality_tier = 'low_quality'
-                    
-                    data['quality_tier'] = quality_tier
-                    
-                    # Track statistics
-                    stats['phase1_scores'].append(phase1_score)
-                    stats['phase2_scores'].append(phase2_score)
-                    stats['phase3_scores'].append(phase3_score)
-                    stats['composite_scores'].append(composite_score)
-                    stats['processed'] += 1
-                    
-                    # Write enhanced task
-                    outfile.write(json.dumps(data, ensure_ascii=False) + '\n')
-                    
-                except json.JSONDecodeError:
-                    continue
-                except Exception as e:
-                    print(f"Error processing line {line_num}: {e}")
-                    continue
+                # Progress update
+                print(f"Processed: {stats['total']:,} tasks")
+            
+            run_chunks(_process_chunk, input_file, merge)
     
     except Exception as e:
         print(f"Error: {e}")
@@ -432,22 +509,26 @@ def process_dataset_with_comprehensive_scores():
     
     if processed > 0:
         # Score statistics
-        import statistics
+        import numpy as np
+        
+        # float64 keeps the tier thresholds (0.8/0.6/0.4) exact
+        score_arrays = {key: np.frombuffer(stats[key], dtype=np.float64)
+                        for key in ('phase1_scores', 'phase2_scores', 'phase3_scores', 'composite_scores')}
         
         def calc_stats(scores, name):
-            mean = statistics.mean(scores)
-            median = statistics.median(scores)
-            stdev = statistics.stdev(scores) if len(scores) > 1 else 0
+            mean = scores.mean()
+            median = np.median(scores)
+            stdev = scores.std(ddof=1) if len(scores) > 1 else 0
             return mean, median, stdev
         
         print(f"\n📊 QUALITY SCORE STATISTICS:")
         print("-" * 40)
         
         for score_type, scores in [
-            ('Phase 1 (Context)', stats['phase1_scores']),
-            ('Phase 2 (Content)', stats['phase2_scores']),
-            ('Phase 3 (Length)', stats['phase3_scores']),
-            ('Composite', stats['composite_scores'])
+            ('Phase 1 (Context)', score_arrays['phase1_scores']),
+            ('Phase 2 (Content)', score_arrays['phase2_scores']),
+            ('Phase 3 (Length)', score_arrays['phase3_scores']),
+            ('Composite', score_arrays['composite_scores'])
         ]:
             mean, median, stdev = calc_stats(scores, score_type)
             print(f"{score_type:<18} Mean: {mean:.3f} ± {stdev:.3f}, Median: {median:.3f}")
@@ -456,10 +537,14 @@ def process_dataset_with_comprehensive_scores():
         print(f"\n🏆 QUALITY TIER DISTRIBUTION:")
         print("-" * 40)
         
-        high_quality = sum(1 for s in stats['composite_scores'] if s >= 0.8)
-        medium_quality = sum(1 for s in stats['composite_scores'] if 0.6 <= s < 0.8)
-        acceptable_quality = sum(1 for s in stats['composite_scores'] if 0.4 <= s < 0.6)
-        low_quality = sum(1 for s in stats['composite_scores'] if s < 0.4)
+        composite = score_arrays['composite_scores']
+        at_least_08 = np.count_nonzero(composite >= 0.8)
+        at_least_06 = np.count_nonzero(composite >= 0.6)
+        at_least_04 = np.count_nonzero(composite >= 0.4)
+        high_quality = at_least_08
+        medium_quality = at_least_06 - at_least_08
+        acceptable_quality = at_least_04 - at_least_06
+        low_quality = processed - at_least_04
         
         print(f"High Quality (≥0.8):     {high_quality:,} ({high_quality/processed*100:.1f}%)")
         print(f"Medium Quality (0.6-0.8): {medium_quality:,} ({medium_quality/processed*100:.1f}%)")
@@ -1,6 +1,15 @@
+import multiprocessing
 import os
 import re
-import json
+from collections import deque
+
+from jsonl_io import N_WORKERS, join_records, json_dumps as _json_dumps
+
+# Deleting these and stripping leaves '' exactly when a line is only brackets/punctuation
+_STRUCTURAL_CHARS = str.maketrans('', '', '{}[]();,.')
+# Comment lines start with one of these once stripped ('*' also covers '*/')
+_COMMENT_STARTS = ('//', '/*', '*')
+_IF_DIRECTIVE = re.compile(r'#\s*if(def|ndef)?\b')
 
 def get_code_files(root_dir):
     code_files = []
@@ -10,45 +19,36 @@ def get_code_files(root_dir):
                 code_files.append(os.path.join(dirpath, f))
     return code_files
 
-def is_code_line(line):
+# Line kinds, decided once per line as it is read. CONTENT and REAL_CODE lines are
+# neither blank nor comments; REAL_CODE lines are the ones has_real_code counts
+BLANK, COMMENT, CONTENT, REAL_CODE = 0, 1, 2, 3
+
+def classify_line(line):
+    """Return (kind, preprocessor directive, has template marker) for a source line"""
     stripped = line.strip()
     if not stripped:
-        return False
-    if stripped.startswith('//') or stripped.startswith('/*') or stripped.startswith('*') or stripped.startswith('*/'):
-        return False
-    if '| Templates *' in line or 'open the template in the editor. */ /* *' in line:
-        return False
-    return True
+        return BLANK, None, False
+    if stripped.startswith(_COMMENT_STARTS):
+        return COMMENT, None, False
+    has_marker = '| Templates *' in line or 'open the template in the editor. */ /* *' in line
+    # Lines that are only brackets, semicolons, or other control characters are not real code,
+    # nor are preprocessor directives (unless they're meaningful like #include)
+    if not stripped.translate(_STRUCTURAL_CHARS).strip():
+        return CONTENT, None, has_marker
+    if stripped.startswith('#'):
+        directive = preprocessor_directive(stripped)
+        if not stripped.startswith('#include'):
+            return CONTENT, directive, has_marker
+        return REAL_CODE, directive, has_marker
+    return REAL_CODE, None, has_marker
+
+def is_code_line(line):
+    kind, _, has_marker = classify_line(line)
+    return kind >= CONTENT and not has_marker
 
 def has_real_code(lines):
     """Check if lines contain at least one or two lines of real C++ code (not just comments, brackets, or control chars)"""
-    real_code_count = 0
-    for line in lines:
-        stripped = line.strip()
-        if not stripped:
-            continue
-        # Skip comments
-        if stripped.startswith('//') or stripped.startswith('/*') or stripped.startswith('*') or stripped.startswith('*/'):
-            continue
-        # Skip lines that are only brackets, semicolons, or other control characters
-        if re.match(r'^[\s{}\[\]();,\.]*$', stripped):
-            continue
-        # Skip preprocessor directives (unless they're meaningful like #include)
-        if stripped.startswith('#') and not stripped.startswith('#include'):
-            continue
-        # This looks like real code
-        real_code_count += 1
-        if real_code_count >= 1:  # At least 1 line of real code
-            return True
-    return False
-
-def clean_input_context(context_lines):
-    # Remove leading blank lines and comments from context
-    while context_lines and (not context_lines[0].strip() or context_lines[0].strip().startswith('/*') or context_lines[0].strip().startswith('//') or context_lines[0].strip().startswith('*')):
-        context_lines = context_lines[1:]
-    # Remove all comment lines from context
-    context_lines = [l for l in context_lines if not (l.strip().startswith('/*') or l.strip().startswith('//') or l.strip().startswith('*'))]
-    return context_lines
+    return any(classify_line(line)[0] == REAL_CODE for line in lines)
 
 def clean_output_lines(output_lines):
     # Remove output lines that are only a dangling '{'
@@ -71,122 +71,179 @@ def clean_output_lines(output_lines):
         close_brackets -= 1
     return cleaned
 
+def preprocessor_directive(stripped):
+    """Return 'if', 'else' (#else/#elif), 'endif' or None for a stripped line"""
+    if not stripped.startswith('#'):
+        return None
+    if _IF_DIRECTIVE.match(stripped):
+        return 'if'
+    if stripped.startswith('#else') or stripped.startswith('#elif'):
+        return 'else'
+    if stripped.startswith('#endif'):
+        return 'endif'
+    return None
+
+def has_invalid_directives(directives):
+    """Check a sequence of preprocessor_directive() results for an #else/#elif/#endif without an open #if"""
+    depth = 0  # open #if blocks; only emptiness matters, so no stack is kept
+    for directive in directives:
+        if directive == 'if':
+            depth += 1
+        elif directive is not None:
+            if not depth:
+                return True  # #else, #elif or #endif without corresponding #if
+            if directive == 'endif':
+                depth -= 1
+    
+    # If depth is not zero, we have unmatched #if directives
+    # This is actually okay for prefix context as long as there's no orphaned #else
+    return False
+
 def has_invalid_preprocessor_structure(context_lines):
     """
     Check if the context has invalid preprocessor structure
     (e.g., #else without #ifdef, unmatched directives)
     """
-    stack = []
-    for line in context_lines:
-        stripped = line.strip()
-        if stripped.startswith('#'):
-            if re.match(r'#\s*if(def|ndef)?\b', stripped):
-                stack.append('if')
-            elif stripped.startswith('#else'):
-                if not stack:
-                    return True  # #else without corresponding #if
-            elif stripped.startswith('#elif'):
-                if not stack:
-                    return True  # #elif without corresponding #if
-            elif stripped.startswith('#endif'):
-                if not stack:
-                    return True  # #endif without corresponding #if
-                stack.pop()
+    return has_invalid_directives(preprocessor_directive(line.strip()) for line in context_lines)
+
+def context_prefixes(recent, min_context, max_context, text):
+    """Return the distinct cleaned, valid prefixes of the context windows ending at the last of recent.
+
+    recent holds (line, kind, directive, has_marker, offset) records for lines of text and
+    ends with a code line. A window is cleaned by dropping its leading blank and comment
+    lines and all other comment lines, so walking backwards from the last line the cleaned
+    context only grows when a content line is reached; blank lines in between are carried
+    along. Until a comment line falls between kept lines, the cleaned context is a plain
+    slice of text.
+    """
+    last_line = recent[-1][0]
+    # Avoid context that ends with only closing brackets/separators (the last line is never blank)
+    if not last_line.strip().strip('}];,'):
+        return []
     
-    # If stack is not empty, we have unmatched #if directives
-    # This is actually okay for prefix context as long as there's no orphaned #else
-    return False
+    prefixes = []
+    end = recent[-1][4] + len(last_line)
+    kept = []        # cleaned context lines, last line first
+    blanks = []      # blank lines above the earliest kept line
+    directives = []  # preprocessor directives of the kept lines, last first
+    comment_above = False  # a comment line lies above the earliest kept line
+    contiguous = True      # no comment line between kept lines so far
+    grown = False
+    n = len(recent)
+    for context_len in range(1, min(max_context, n) + 1):
+        line, kind, directive, has_marker, offset = recent[n - context_len]
+        if kind >= CONTENT:
+            # Avoid context inside a comment block; every longer window keeps this line too
+            if has_marker:
+                break
+            kept.extend(blanks)
+            blanks.clear()
+            kept.append(line)
+            if directive is not None:
+                directives.append(directive)
+            if comment_above:
+                contiguous = False
+            start = offset
+            grown = True
+        elif kind == BLANK:
+            blanks.append(line)
+        else:
+            comment_above = True
+        
+        if grown and context_len >= min_context:
+            grown = False
+            # Check for invalid preprocessor structure (e.g., #else without #ifdef)
+            if not has_invalid_directives(reversed(directives)):
+                prefixes.append(text[start:end] if contiguous else '\n'.join(reversed(kept)))
+    return prefixes
 
 def extract_pairs_from_file(filepath, min_context=2, max_context=10, max_output=2):
-    pairs = []
-    seen_pairs = set()  # Deduplication set
-    with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
-        lines = f.readlines()
-    code_indices = [i for i, l in enumerate(lines) if is_code_line(l)]
-    
     # Strategy 1: Extract pairs with varying output lengths (1 line and 2 lines)
-    for output_len in [1, 2]:  # Generate pairs for both 1-line and 2-line outputs
-        for idx in range(len(code_indices) - output_len):
-            for context_len in range(min_context, max_context+1):
-                context_end = code_indices[idx]
-                context_start = context_end - context_len + 1
-                if context_start < 0:
-                    continue
-                context_lines = [lines[i].rstrip('\n') for i in range(context_start, context_end+1)]
-                context_lines = clean_input_context(context_lines)
-                # Check for invalid preprocessor structure (e.g., #else without #ifdef)
-                if has_invalid_preprocessor_structure(context_lines):
-                    continue
-                output_lines = []
-                for j in range(1, output_len+1):
-                    if idx + j < len(code_indices):
-                        output_lines.append(lines[code_indices[idx + j]].rstrip('\n'))
-                output_lines = clean_output_lines(output_lines)
-                if context_lines and output_lines:
-                    # Ensure output contains at least one line of real C++ code
-                    if not has_real_code(output_lines):
-                        continue
-                    # Avoid context/output that starts or ends with only brackets or is inside a comment block
-                    if not re.match(r'^\s*[\}\];,]+\s*$', context_lines[-1]) and not any('| Templates *' in l or 'open the template in the editor. */ /* *' in l for l in context_lines + output_lines):
-                        prefix = '\n'.join(context_lines)
-                        middle = '\n'.join(output_lines)
-                        # Create FIM format with underscore tags
-                        fim_content = f"<fim_prefix>{prefix}<fim_suffix><fim_middle>{middle}"
-                        pair_tuple = (prefix, middle)
-                        if pair_tuple not in seen_pairs:
-                            pairs.append({
-                                'content': fim_content
-                            })
-                            seen_pairs.add(pair_tuple)
+    # Strategy 2: Overlapping sliding window pairs of max_output lines, stepping by
+    # 2 code lines. With max_output <= 2 every one of them is already produced by strategy 1
+    passes = [(1, 1), (2, 1)]  # (output_len, step)
+    if max_output > 2:
+        passes.append((max_output, 2))
+    pass_pairs = [[] for _ in passes]
+    pass_seen = [set() for _ in passes]
     
-    # Strategy 2: Add overlapping sliding window pairs (with step size < context length)
-    step_size = 2  # Step by 2 lines instead of full context length
-    for idx in range(0, len(code_indices) - max_output, step_size):
-        for context_len in range(min_context, max_context+1):
-            context_end = code_indices[idx]
-            context_start = context_end - context_len + 1
-            if context_start < 0:
+    # Lines are scanned once: only the last max_context classified lines (for contexts)
+    # and the last few code lines with their kinds and prefixes (for outputs) are kept;
+    # contexts are sliced from the file text where possible
+    recent = deque(maxlen=max_context)
+    code_lines = deque(maxlen=max(output_len for output_len, _ in passes) + 1)
+    code_count = 0
+    with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
+        text = f.read()
+    pos = 0
+    while pos < len(text):
+        line_end = text.find('\n', pos)
+        if line_end == -1:
+            line_end = len(text)
+        line = text[pos:line_end]
+        kind, directive, has_marker = classify_line(line)
+        recent.append((line, kind, directive, has_marker, pos))
+        pos = line_end + 1
+        if kind < CONTENT or has_marker:
+            continue  # not a code line (see is_code_line)
+        code_lines.append((line, kind, context_prefixes(recent, min_context, max_context, text)))
+        
+        # The newest code line completes the output of the code line output_len before it
+        for (output_len, step), pairs, seen in zip(passes, pass_pairs, pass_seen):
+            idx = code_count - output_len
+            if idx < 0 or idx % step:
                 continue
-            context_lines = [lines[i].rstrip('\n') for i in range(context_start, context_end+1)]
-            context_lines = clean_input_context(context_lines)
-            # Check for invalid preprocessor structure (e.g., #else without #ifdef)
-            if has_invalid_preprocessor_structure(context_lines):
+            prefixes = code_lines[-1 - output_len][2]
+            if not prefixes:
+                continue
+            outputs = [code_lines[i] for i in range(-output_len, 0)]
+            # Ensure output contains at least one line of real C++ code. clean_output_lines
+            # only drops lines that are not real code and never changes whether a kept line
+            # is, so this is decided on the raw lines before cleaning. Output lines are code
+            # lines, which never carry a template marker
+            if not any(kind == REAL_CODE for _, kind, _ in outputs):
                 continue
-            output_lines = []
-            for j in range(1, max_output+1):
-                if idx + j < len(code_indices):
-                    output_lines.append(lines[code_indices[idx + j]].rstrip('\n'))
-            output_lines = clean_output_lines(output_lines)
-            if context_lines and output_lines:
-                # Ensure output contains at least one line of real C++ code
-                if not has_real_code(output_lines):
-                    continue
-                # Avoid context/output that starts or ends with only brackets or is inside a comment block
-                if not re.match(r'^\s*[\}\];,]+\s*$', context_lines[-1]) and not any('| Templates *' in l or 'open the template in the editor. */ /* *' in l for l in context_lines + output_lines):
-                    prefix = '\n'.join(context_lines)
-                    middle = '\n'.join(output_lines)
-                    # Create FIM format with underscore tags
-                    fim_content = f"<fim_prefix>{prefix}<fim_suffix><fim_middle>{middle}"
-                    pair_tuple = (prefix, middle)
-                    if pair_tuple not in seen_pairs:
-                        pairs.append({
-                            'content': fim_content
-                        })
-                        seen_pairs.add(pair_tuple)
+            middle = '\n'.join(clean_output_lines([output for output, _, _ in outputs]))
+            for prefix in prefixes:
+                pair_tuple = (prefix, middle)
+                if pair_tuple not in seen:
+                    pairs.append(pair_tuple)
+                    seen.add(pair_tuple)
+        code_count += 1
+    
+    # Passes are concatenated in order, so a pair is kept where a pass-by-pass scan
+    # first finds it. The first pass is already duplicate-free and its set is reused
+    # as the deduplication set for the later passes
+    seen_pairs = pass_seen[0]
+    for pass_list in pass_pairs[1:]:
+        for pair_tuple in pass_list:
+            if pair_tuple not in seen_pairs:
+                pass_pairs[0].append(pair_tuple)
+                seen_pairs.add(pair_tuple)
+    
+    # Create FIM format with underscore tags
+    pairs = [{'content': f"<fim_prefix>{prefix}<fim_suffix><fim_middle>{middle}"}
+             for prefix, middle in pass_pairs[0]]
     
     return pairs
 
+def _extract_file_jsonl(filepath):
+    """Pool worker: return a file's pairs as one newline-terminated JSONL buffer plus the pair count"""
+    pairs = extract_pairs_from_file(filepath)
+    return join_records([_json_dumps(pair) for pair in pairs]), len(pairs)
+
 def main():
     root_dir = 'code'
     code_files = get_code_files(root_dir)
-    all_pairs = []
-    for f in code_files:
-        pairs = extract_pairs_from_file(f)
-        all_pairs.extend(pairs)
-    with open('prompts_codebricks_autogenerated_underscore.jsonl', 'w', encoding='utf-8') as out:
-        for pair in all_pairs:
-            out.write(json.dumps(pair, ensure_ascii=False) + '\n')
-    print(f"Extracted {len(all_pairs)} FIM pairs in underscore format.")
+    total_pairs = 0
+    # Files are independent (deduplication is per file), so they are extracted in
+    # parallel; imap keeps file order so the output matches a serial run
+    with open('prompts_codebricks_autogenerated_underscore.jsonl', 'wb', buffering=1 << 20) as out, \
+         multiprocessing.Pool(N_WORKERS) as pool:
+        for file_lines, file_pairs in pool.imap(_extract_file_jsonl, code_files, chunksize=8):
+            out.write(file_lines)
+            total_pairs += file_pairs
+    print(f"Extracted {total_pairs} FIM pairs in underscore format.")
 
 if __name__ == '__main__':
     main()
@@ -1,27 +1,90 @@
+import functools
 import json
 import re
 from typing import List, Dict, Set
 
-def extract_fim_parts(content: str) -> Dict[str, str]:
-    """Extract prefix, suffix, and middle from FIM content"""
-    parts = {}
-    
-    # Extract prefix
-    prefix_match = re.search(r'<fim_prefix>(.*?)<fim_suffix>', content, re.DOTALL)
-    if prefix_match:
-        parts['prefix'] = prefix_match.group(1)
-    
-    # Extract suffix (usually empty in our case)
-    suffix_match = re.search(r'<fim_suffix>(.*?)<fim_middle>', content, re.DOTALL)
-    if suffix_match:
-        parts['suffix'] = suffix_match.group(1)
-    
-    # Extract middle
-    middle_match = re.search(r'<fim_middle>(.*?)$', content, re.DOTALL)
-    if middle_match:
-        parts['middle'] = middle_match.group(1)
-    
-    return parts
+from fim_utils import extract_fim_parts_v1 as extract_fim_parts
+from jsonl_io import N_WORKERS, iter_range_lines, join_records, run_chunks
+from jsonl_io import json_dumps as _json_dumps, json_loads as _json_loads
+
+MIDDLE_CACHE_MAX_LEN = 512  # longer middles are rarely repeated and would bloat the cache
+
+# Patterns are compiled once at import; the filter runs them on every task.
+# Deleting these and stripping leaves '' exactly when a line is only brackets/punctuation
+_STRUCTURAL_CHARS = str.maketrans('', '', '{}[]();,.')
+_CLOSING_BRACES_ONLY = re.compile(r'^[\s}]+$')
+_MEANINGLESS_RE = re.compile(
+    r'^[;,]+$'                     # Just punctuation
+    r'|^\s*\)\s*[;{]*\s*$'         # Just closing parentheses
+    r'|^\s*else\s*$'               # Standalone else
+    r'|^\s*\+\+\s*$'               # Just increment
+    r'|^\s*--\s*$'                 # Just decrement
+)
+_BARE_NAMESPACE = re.compile(r'^\s*namespace\s+\w+\s*$')
+_MEANINGFUL_RE = re.compile(
+    r'\w+\s*\([^)]*\)'     # Function calls
+    r'|class\s+\w+'         # Class definitions
+    r'|struct\s+\w+'        # Struct definitions
+    r'|\w+\s*=\s*\w+'       # Assignments
+    r'|if\s*\('             # Control structures
+    r'|for\s*\('
+    r'|while\s*\('
+    r'|return\s+'           # Return statements
+    r'|#include\s*[<"]'     # Include statements
+    r'|using\s+namespace'   # Using declarations
+    r'|public:|private:|protected:'  # Access specifiers
+    r'|\w+::\w+'            # Scope resolution
+)
+_DECLARATION_KEYWORD = re.compile(r'\b(int|double|float|char|bool|void|const|static|virtual|inline)\b')
+_TB_IDENTIFIER = re.compile(r'\bTB[A-Z]+\b')
+
+# Keyword checks are spelled out as chained `in` tests: for a handful of short
+# literals on typical middles (a few dozen characters) that is cheaper than a
+# generator over a list or a regex alternation; the regex only wins on middles of
+# several hundred characters, which are rare.
+_LOGICAL_CONTINUATIONS = [
+    # After includes, expect more includes, namespace, or declarations
+    (re.compile(r'#include\s*[<"]'), lambda m: '#include' in m or 'namespace' in m or 'using' in m),
+    
+    # After namespace declaration, expect opening brace or content
+    (re.compile(r'namespace\s+\w+'), lambda m: '{' in m or 'class' in m or 'struct' in m or 'enum' in m or 'void' in m or 'int' in m),
+    
+    # After class/struct declaration, expect opening brace or inheritance
+    (re.compile(r'(class|struct)\s+\w+'), lambda m: '{' in m or ':' in m or 'public' in m or 'private' in m),
+    
+    # After function signature, expect opening brace or implementation
+    (re.compile(r'\w+\s*\([^)]*\)\s*(const)?\s*$'), lambda m: '{' in m or 'return' in m or 'if' in m or 'for' in m or 'while' in m),
+    
+    # After access specifiers, expect declarations
+    (re.compile(r'(public|private|protected)\s*:'), lambda m: 'void' in m or 'int' in m or 'double' in m or 'virtual' in m or 'static' in m or 'const' in m),
+]
+
+_INCOMPLETE_CONTROL_RE = re.compile(
+    r'^if\s*\('            # Standalone if statements
+    r'|^else\s*$'          # Standalone else
+    r'|^else\s*if\s*\('    # Standalone else if
+    r'|^for\s*\('          # Standalone for loops
+    r'|^while\s*\('        # Standalone while loops
+    r'|^switch\s*\('       # Standalone switch
+    r'|^catch\s*\('        # Standalone catch
+    r'|^try\s*$'           # Standalone try
+    r'|^return\s*[^;]*$'   # Incomplete return statements
+)
+_SINGLE_WORD = re.compile(r'^\w+$')
+_DIRECTIVE_WORD = re.compile(r'#\w')
+# First words (followed by a space) that decide the first line on their own
+_ACCEPTED_FIRST_WORDS = {'namespace', 'using', 'class', 'struct', 'enum'}
+_REJECTED_FIRST_WORDS = {'auto', 'const', 'static'}
+_FUNCTION_DECLARATION = re.compile(r'^[\w:<>~]+.*\w+\s*\([^)]*\)')
+_UPPERCASE_CALL = re.compile(r'^[A-Z_]+\(')
+_VARIABLE_DECLARATION = re.compile(r'^(const\s+)?(static\s+)?(virtual\s+)?[\w:<>]+\s+\w+\s*[=;]')
+_MEANINGFUL_COMPLETE_RE = re.compile(
+    r'^#\w+'               # Preprocessor directives
+    r'|^\w+\s+\w+.*[;{]$'  # Complete declarations or definitions
+    r'|^typedef\s+'        # Type definitions
+    r'|^template\s*<'      # Template declarations
+    r'|^\w+::\w+'          # Scoped identifiers (when not in function calls)
+)
 
 def is_meaningful_code_completion(middle: str, prefix: str) -> bool:
     """Judge if the middle part represents a meaningful, feasible auto-completion"""
@@ -36,28 +99,20 @@ def is_meaningful_code_completion(middle: str, prefix: str) -> bool:
         return False
     
     # Reject if middle is only symbols/punctuation
-    if re.match(r'^[\s\{\}\[\]\(\);,\.]+$', middle_stripped):
+    if not middle_stripped.translate(_STRUCTURAL_CHARS).strip():
         return False
     
     # Reject if middle is just a closing brace or return statement without content
-    if re.match(r'^[\s}]+$', middle_stripped) or middle_stripped == 'return;':
+    if _CLOSING_BRACES_ONLY.match(middle_stripped) or middle_stripped == 'return;':
         return False
     
     # Reject incomplete or meaningless fragments
-    meaningless_patterns = [
-        r'^[;,]+$',                    # Just punctuation
-        r'^\s*\)\s*[;{]*\s*$',        # Just closing parentheses
-        r'^\s*else\s*$',               # Standalone else
-        r'^\s*\+\+\s*$',               # Just increment
-        r'^\s*--\s*$',                 # Just decrement
-    ]
-    
-    for pattern in meaningless_patterns:
-        if re.match(pattern, middle_stripped):
-            return False
+    if _MEANINGLESS_RE.match(middle_stripped):
+        return False
     
     # Reject if middle is only preprocessor directives (except meaningful ones)
-    if middle_stripped.startswith('#') and not any(keyword in middle_stripped for keyword in ['#include', '#define', '#ifndef', '#ifdef']):
+    if middle_stripped.startswith('#') and not ('#include' in middle_stripped or '#define' in middle_stripped or
+                                                '#ifndef' in middle_stripped or '#ifdef' in middle_stripped):
         return False
     
     # Reject if middle contains only comments
@@ -67,41 +122,27 @@ def is_meaningful_code_completion(middle: str, prefix: str) -> bool:
         return False
     
     # Reject if middle is just namespace declaration without meaningful content
-    if re.match(r'^\s*namespace\s+\w+\s*$', middle_stripped):
+    if _BARE_NAMESPACE.match(middle_stripped):
         return False
     
     # Accept meaningful C++ constructs
-    meaningful_patterns = [
-        r'\w+\s*\([^)]*\)',  # Function calls
-        r'class\s+\w+',      # Class definitions
-        r'struct\s+\w+',     # Struct definitions
-        r'\w+\s*=\s*\w+',    # Assignments
-        r'if\s*\(',          # Control structures
-        r'for\s*\(',
-        r'while\s*\(',
-        r'return\s+',        # Return statements
-        r'#include\s*[<"]',  # Include statements
-        r'using\s+namespace', # Using declarations
-        r'public:', r'private:', r'protected:', # Access specifiers
-        r'\w+::\w+',         # Scope resolution
-    ]
-    
-    for pattern in meaningful_patterns:
-        if re.search(pattern, middle_stripped):
-            return True
+    if _MEANINGFUL_RE.search(middle_stripped):
+        return True
     
     # Check for meaningful variable/function declarations
-    if re.search(r'\b(int|double|float|char|bool|void|const|static|virtual|inline)\b', middle_stripped):
+    if _DECLARATION_KEYWORD.search(middle_stripped):
         return True
     
     # Check for C++ keywords that indicate meaningful code
-    cpp_keywords = ['const', 'static', 'virtual', 'override', 'public', 'private', 'protected', 
-                   'class', 'struct', 'enum', 'typedef', 'template', 'typename', 'namespace']
-    if any(keyword in middle_stripped for keyword in cpp_keywords):
+    if ('const' in middle_stripped or 'static' in middle_stripped or 'virtual' in middle_stripped or
+            'override' in middle_stripped or 'public' in middle_stripped or 'private' in middle_stripped or
+            'protected' in middle_stripped or 'class' in middle_stripped or 'struct' in middle_stripped or
+            'enum' in middle_stripped or 'typedef' in middle_stripped or 'template' in middle_stripped or
+            'typename' in middle_stripped or 'namespace' in middle_stripped):
         return True
     
     # Accept if contains tbricks-specific patterns (domain-specific meaningful code)
-    if re.search(r'\bTB[A-Z]+\b', middle_stripped) or 'tbricks::' in middle_stripped:
+    if _TB_IDENTIFIER.search(middle_stripped) or 'tbricks::' in middle_stripped:
         return True
     
     return False
@@ -117,88 +158,106 @@ def has_logical_context_flow(prefix: str, middle: str, suffix: str) -> bool:
     middle_stripped = middle.strip()
     
     # Check for logical continuations
-    logical_continuations = [
-        # After includes, expect more includes, namespace, or declarations
-        (r'#include\s*[<"]', lambda m: '#include' in m or 'namespace' in m or 'using' in m),
-        
-        # After namespace declaration, expect opening brace or content
-        (r'namespace\s+\w+', lambda m: '{' in m or any(kw in m for kw in ['class', 'struct', 'enum', 'void', 'int'])),
-        
-        # After class/struct declaration, expect opening brace or inheritance
-        (r'(class|struct)\s+\w+', lambda m: '{' in m or ':' in m or 'public' in m or 'private' in m),
-        
-        # After function signature, expect opening brace or implementation
-        (r'\w+\s*\([^)]*\)\s*(const)?\s*$', lambda m: '{' in m or any(kw in m for kw in ['return', 'if', 'for', 'while'])),
-        
-        # After access specifiers, expect declarations
-        (r'(public|private|protected)\s*:', lambda m: any(kw in m for kw in ['void', 'int', 'double', 'virtual', 'static', 'const'])),
-    ]
-    
-    for pattern, check_func in logical_continuations:
-        if re.search(pattern, last_prefix_line):
+    for pattern, check_func in _LOGICAL_CONTINUATIONS:
+        if pattern.search(last_prefix_line):
             if check_func(middle_stripped):
                 return True
     
     return True  # Default to accepting if no specific pattern matched
 
-def calculate_quality_score(parts: Dict[str, str]) -> float:
-    """Calculate a quality score for the FIM task (0-1, higher is better)"""
-    
-    prefix = parts.get('prefix', '')
-    middle = parts.get('middle', '')
-    suffix = parts.get('suffix', '')
-    
+def _sum_quality_score(meaningful: bool, logical_flow: bool, length_bonus: float, domain: bool, constructs: bool) -> float:
+    """Add up the quality score bonuses (always in this order, so the float result is reproducible)"""
     score = 0.0
     
-    # Essential: Check if prefix starts with complete code lines
-    if not starts_with_complete_code_line(prefix):
-        return 0.0  # Immediate rejection for incomplete prefix
-    
     # Base score for having meaningful completion
-    if is_meaningful_code_completion(middle, prefix):
+    if meaningful:
         score += 0.4
     
     # Bonus for logical context flow
-    if has_logical_context_flow(prefix, middle, suffix):
+    if logical_flow:
         score += 0.2
     
     # Bonus for appropriate length (not too short, not too long)
-    middle_len = len(middle.strip())
-    if 10 <= middle_len <= 200:
-        score += 0.2
-    elif 5 <= middle_len <= 300:
-        score += 0.1
+    if length_bonus:
+        score += length_bonus
     
     # Bonus for containing domain-specific (tbricks) content
-    if 'tbricks' in middle.lower() or re.search(r'\bTB[A-Z]+\b', middle):
+    if domain:
         score += 0.1
     
     # Bonus for containing meaningful C++ constructs
-    meaningful_constructs = ['class', 'struct', 'namespace', 'public:', 'private:', 'virtual', 'const']
-    if any(construct in middle for construct in meaningful_constructs):
+    if constructs:
         score += 0.1
     
     return min(score, 1.0)
 
-def filter_quality_fim_tasks(input_file: str, output_file: str, quality_threshold: float = 0.5):
-    """Filter FIM tasks based on quality assessment"""
+def calculate_quality_score(parts: Dict[str, str], threshold: float = 0.0) -> float:
+    """Calculate a quality score for the FIM task (0-1, higher is better)
+
+    With a threshold, scoring stops and returns 0.0 as soon as the task can no longer
+    reach it; scores at or above the threshold are always exact.
+    """
     
-    print(f"Reading FIM tasks from {input_file}...")
-    print(f"Quality threshold: {quality_threshold}")
+    prefix = parts.get('prefix', '')
+    middle = parts.get('middle', '')
+    suffix = parts.get('suffix', '')
+    
+    # Essential: Check if prefix starts with complete code lines
+    if not starts_with_complete_code_line(prefix):
+        return 0.0  # Immediate rejection for incomplete prefix
+    
+    logical_flow = has_logical_context_flow(prefix, middle, suffix)
     
+    # Short middles ("}", "return true;", ...) repeat across tasks, so their checks are cached
+    if len(middle) < MIDDLE_CACHE_MAX_LEN:
+        return _middle_score_cached(middle, logical_flow, threshold)
+    return _middle_score(middle, logical_flow, threshold)
+
+def _middle_score(middle: str, logical_flow: bool, threshold: float) -> float:
+    """The rest of calculate_quality_score once the prefix checks are done; depends on the middle alone"""
+    
+    # Cheap substring/length bonuses before the regex-heavy checks
+    middle_len = len(middle.strip())
+    if 10 <= middle_len <= 200:
+        length_bonus = 0.2
+    elif 5 <= middle_len <= 300:
+        length_bonus = 0.1
+    else:
+        length_bonus = 0.0
+    domain = 'tbricks' in middle.lower() or _TB_IDENTIFIER.search(middle) is not None
+    constructs = ('class' in middle or 'struct' in middle or 'namespace' in middle or 'public:' in middle or
+                  'private:' in middle or 'virtual' in middle or 'const' in middle)
+    
+    # Skip the meaningfulness check once even passing it cannot reach the threshold
+    if _sum_quality_score(True, logical_flow, length_bonus, domain, constructs) < threshold:
+        return 0.0
+    
+    # is_meaningful_code_completion does not look at the prefix
+    meaningful = is_meaningful_code_completion(middle, '')
+    return _sum_quality_score(meaningful, logical_flow, length_bonus, domain, constructs)
+
+_middle_score_cached = functools.lru_cache(maxsize=65536)(_middle_score)
+
+def _process_chunk(args):
+    """Filter the lines starting inside the byte range [start, end) of the input file.
+
+    Returns the accepted tasks as one JSONL bytes buffer with the chunk's
+    (good, rejected, total) counts, its number of lines and its errors (see run_chunks).
+    """
+    path, start, end, quality_threshold = args
     good_count = 0
     rejected_count = 0
     total_count = 0
+    out = []
+    errors = []
     
-    # Process line by line and write good tasks immediately to avoid memory issues
-    with open(input_file, 'r', encoding='utf-8') as infile, \
-         open(output_file, 'w', encoding='utf-8') as outfile:
-        
-        for line_num, line in enumerate(infile, 1):
+    with open(path, 'rb') as infile:
+        line_num = 0
+        for line_num, line in enumerate(iter_range_lines(infile, start, end), 1):
             if line.strip():
                 total_count += 1
                 try:
-                    task = json.loads(line)
+                    task = _json_loads(line)
                     content = task.get('content', '')
                     
                     # Extract FIM parts
@@ -208,31 +267,55 @@ def filter_quality_fim_tasks(input_file: str, output_file: str, quality_threshol
                         rejected_count += 1
                         continue
                     
-                    # Calculate quality score
-                    quality_score = calculate_quality_score(parts)
+                    # Calculate quality score (exact whenever it reaches the threshold)
+                    quality_score = calculate_quality_score(parts, quality_threshold)
                     
                     if quality_score >= quality_threshold:
                         # Add quality score to the task
                         task['quality_score'] = quality_score
                         task['quality_phase'] = 'phase1_context_quality'
-                        outfile.write(json.dumps(task, ensure_ascii=False) + '\n')
+                        out.append(_json_dumps(task))
                         good_count += 1
                     else:
                         rejected_count += 1
                         
-                    # Progress report
-                    if line_num % 100000 == 0:
-                        print(f"Processed {line_num:,} tasks. Accepted: {good_count:,}, Rejected: {rejected_count:,}")
-                        
                 except json.JSONDecodeError as e:
-                    print(f"JSON decode error at line {line_num}: {e}")
+                    errors.append(("JSON decode error at line", line_num, str(e)))
                     rejected_count += 1
                     continue
                 except Exception as e:
-                    print(f"Error at line {line_num}: {e}")
+                    errors.append(("Error at line", line_num, str(e)))
                     rejected_count += 1
                     continue
     
+    return (join_records(out), good_count, rejected_count, total_count), line_num, errors
+
+def filter_quality_fim_tasks(input_file: str, output_file: str, quality_threshold: float = 0.5):
+    """Filter FIM tasks based on quality assessment"""
+    
+    print(f"Reading FIM tasks from {input_file}...")
+    print(f"Quality threshold: {quality_threshold}")
+    print(f"Workers: {N_WORKERS}")
+    
+    good_count = 0
+    rejected_count = 0
+    total_count = 0
+    
+    # Good tasks are written as each chunk finishes to avoid memory issues
+    with open(output_file, 'wb') as outfile:
+        def merge(chunk, lines_before, lines_done):
+            nonlocal good_count, rejected_count, total_count
+            kept_lines, chunk_good, chunk_rejected, chunk_total = chunk
+            outfile.write(kept_lines)
+            good_count += chunk_good
+            rejected_count += chunk_rejected
+            total_count += chunk_total
+            
+            # Progress report
+            print(f"Processed {total_count:,} tasks. Accepted: {good_count:,}, Rejected: {rejected_count:,}")
+        
+        run_chunks(_process_chunk, input_file, merge, extra=(quality_threshold,))
+    
     print(f"\nFiltering complete!")
     print(f"Total tasks processed: {total_count:,}")
     print(f"Good tasks accepted: {good_count:,}")
@@ -274,90 +357,63 @@ def starts_with_complete_code_line(prefix: str) -> bool:
     if not prefix or not prefix.strip():
         return False
     
+    # Only the first line and the first non-blank line matter, so don't split the whole prefix
+    newline = prefix.find('\n')
+    original_first_line = prefix if newline < 0 else prefix[:newline]
+    
     # Get the first meaningful line (skip empty lines)
-    lines = prefix.split('\n')
-    first_line = None
-    for line in lines:
-        stripped = line.strip()
-        if stripped:
-            first_line = stripped
-            break
-    
-    if not first_line:
-        return False
+    first_line = prefix.lstrip()
+    newline = first_line.find('\n')
+    if newline >= 0:
+        first_line = first_line[:newline]
+    first_line = first_line.rstrip()
     
     # REJECT: If the original first line (before stripping) has excessive leading whitespace
     # This indicates the context starts in the middle of a code block, which is poor for FIM
-    original_first_line = lines[0] if lines else ""
     leading_spaces = len(original_first_line) - len(original_first_line.lstrip())
     if leading_spaces > 4:  # More than one level of indentation suggests starting mid-block
         return False
     
+    # Preprocessor lines: #include, #pragma, #ifndef/#ifdef/#define and any other
+    # #word directive are accepted; none of the checks below can reject them
+    if first_line[0] == '#':
+        return _DIRECTIVE_WORD.match(first_line) is not None
+    
     # REJECT: Lines that start with meaningless delimiters or incomplete control structures
     # These make poor auto-completion contexts as identified by the user
     
     # Reject if starts with incomplete control structures without proper context
-    incomplete_control_patterns = [
-        r'^if\s*\(',           # Standalone if statements
-        r'^else\s*$',          # Standalone else
-        r'^else\s*if\s*\(',    # Standalone else if
-        r'^for\s*\(',          # Standalone for loops
-        r'^while\s*\(',        # Standalone while loops
-        r'^switch\s*\(',       # Standalone switch
-        r'^catch\s*\(',        # Standalone catch
-        r'^try\s*$',           # Standalone try
-        r'^return\s*[^;]*$',   # Incomplete return statements
-    ]
-    
-    for pattern in incomplete_control_patterns:
-        if re.match(pattern, first_line):
-            return False
+    if _INCOMPLETE_CONTROL_RE.match(first_line):
+        return False
     
     # REJECT: Lines that are only closing braces or meaningless punctuation
-    if re.match(r'^[\s{}\[\]();,\.]*$', first_line):
+    if not first_line.translate(_STRUCTURAL_CHARS).strip():
         return False
     
     # REJECT: Single words or identifiers without context
-    if re.match(r'^\w+$', first_line):
+    if _SINGLE_WORD.match(first_line):
         return False
     
-    # BOOST: #include patterns (51.3% in reference, only 1.7% in generated)
-    if first_line.startswith('#include') and (first_line.endswith('.h"') or first_line.endswith('.hpp"') or first_line.endswith('>') or '"' in first_line):
-        return True
-    
-    # BOOST: OTHER_PREPROCESSOR patterns like #pragma (45.0% in reference, only 0.2% in generated)
-    if first_line.startswith('#pragma'):
-        return True
-    
-    # Accept other meaningful preprocessor directives
-    if first_line.startswith('#ifndef') or first_line.startswith('#ifdef') or first_line.startswith('#define'):
-        return True
-    
-    # Accept namespace and using statements (present in reference)
-    if first_line.startswith('namespace ') or first_line.startswith('using '):
-        return True
-    
-    # Accept complete class/struct declarations
-    if first_line.startswith('class ') or first_line.startswith('struct ') or first_line.startswith('enum '):
+    # Accept namespace and using statements (present in reference) and
+    # complete class/struct/enum declarations
+    first_word, space, _ = first_line.partition(' ')
+    if space and first_word in _ACCEPTED_FIRST_WORDS:
         return True
     
     # Accept complete function declarations/definitions (must have both function name and parentheses)
-    if re.match(r'^[\w:<>~]+.*\w+\s*\([^)]*\)', first_line):
+    if _FUNCTION_DECLARATION.match(first_line):
         return True
     
     # REDUCE: function calls/statements without proper context (2.6% vs 33.6%)
-    if (re.match(r'^[A-Z_]+\(', first_line) or  # TEST_, EXPECT_, etc.
-        first_line.startswith('auto ') or 
-        first_line.startswith('const ') or
-        first_line.startswith('static ')):
+    if (space and first_word in _REJECTED_FIRST_WORDS) or _UPPERCASE_CALL.match(first_line):  # TEST_, EXPECT_, etc.
         return False
     
     # REDUCE: method_definition patterns without class context (0.4% vs 15.6%)
-    if '::' in first_line and '(' in first_line and not first_line.startswith('#'):
+    if '::' in first_line and '(' in first_line:
         return False
     
     # REDUCE: variable_declaration patterns without class/function context (0% vs 13.1%)
-    if re.match(r'^(const\s+)?(static\s+)?(virtual\s+)?[\w:<>]+\s+\w+\s*[=;]', first_line):
+    if _VARIABLE_DECLARATION.match(first_line):
         return False
     
     # REDUCE: access_specifier without proper context
@@ -366,17 +422,8 @@ def starts_with_complete_code_line(prefix: str) -> bool:
     
     # Accept complete statements that provide meaningful context
     # These should be complete logical units that a developer can reasonably continue
-    meaningful_complete_patterns = [
-        r'^#\w+',              # Preprocessor directives
-        r'^\w+\s+\w+.*[;{]$',  # Complete declarations or definitions
-        r'^typedef\s+',        # Type definitions
-        r'^template\s*<',      # Template declarations
-        r'^\w+::\w+',          # Scoped identifiers (when not in function calls)
-    ]
-    
-    for pattern in meaningful_complete_patterns:
-        if re.match(pattern, first_line):
-            return True
+    if _MEANINGFUL_COMPLETE_RE.match(first_line):
+        return True
     
     # Reject everything else to be more conservative
     # This ensures we only get high-quality FIM tasks with meaningful starting context
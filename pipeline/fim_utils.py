@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+FIM Marker Helpers
+
+Shared extraction of the completion (middle) part of FIM tasks. The markers are
+fixed literals, so plain str.find slicing is used instead of regular expressions.
+
+- v1: underscore tags used by the pipeline  (<fim_prefix>...<fim_suffix><fim_middle>...)
+"""
+
+_PREFIX_V1 = '<fim_prefix>'
+_SUFFIX_V1 = '<fim_suffix>'
+_MARKER_V1 = '<fim_middle>'
+
+def extract_fim_parts_v1(content):
+    """Split a v1 FIM task into a dict of its 'prefix', 'suffix' and 'middle' (unstripped).
+
+    Same results as the regexes <fim_prefix>(.*?)<fim_suffix>, <fim_suffix>(.*?)<fim_middle>
+    and <fim_middle>(.*?)$ (DOTALL); a key is omitted when its pattern would not match.
+    """
+    parts = {}
+    
+    p = content.find(_PREFIX_V1)
+    s = content.find(_SUFFIX_V1)
+    m = content.find(_MARKER_V1)
+    
+    if p != -1:
+        end = content.find(_SUFFIX_V1, p + len(_PREFIX_V1))
+        if end != -1:
+            parts['prefix'] = content[p + len(_PREFIX_V1):end]
+    
+    if s != -1:
+        end = content.find(_MARKER_V1, s + len(_SUFFIX_V1))
+        if end != -1:
+            parts['suffix'] = content[s + len(_SUFFIX_V1):end]
+    
+    if m != -1:
+        middle = content[m + len(_MARKER_V1):]
+        # '$' also matches before a single trailing newline
+        if middle.endswith('\n'):
+            middle = middle[:-1]
+        parts['middle'] = middle
+    
+    return parts
+
+def extract_fim_middle_v1(content):
+    """Return the stripped text after <fim_middle>, up to the next tag; "" if absent"""
+    try:
+        start = content.find(_MARKER_V1)
+        if start < 0:
+            return ""
+        start += len(_MARKER_V1)
+        end = content.find('<', start)
+        return content[start:end if end != -1 else None].strip()
+    except:
+        return ""
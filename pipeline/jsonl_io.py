@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+JSONL I/O Helpers
+
+Shared JSONL plumbing for the pipeline scripts:
+
+- json_loads / json_dumps: orjson when installed, else the stdlib codec (dumps returns UTF-8 bytes)
+- byte_ranges / iter_range_lines: split a file into byte ranges for worker processes
+  and read back the lines starting inside one range
+- line_offset: where a file's first n lines end, to hand only those out as ranges
+- run_chunks: run a worker over a file's byte ranges in a process pool and merge the results in file order
+- join_records: one JSONL buffer from a worker's encoded records
+
+Lines are bytes without their trailing newline.
+"""
+
+import json
+import mmap
+import multiprocessing
+import os
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib codec
+    orjson = None
+
+if orjson is not None:
+    json_loads = orjson.loads
+    json_dumps = orjson.dumps
+else:
+    json_loads = json.loads
+
+    def json_dumps(obj, default=None):
+        return json.dumps(obj, ensure_ascii=False, default=default).encode('utf-8')
+
+N_WORKERS = os.cpu_count() or 1
+CHUNK_BYTES = 64 * 1024 * 1024  # upper bound on the byte range handed to one worker
+SLICE_SIZE = 8 * 1024 * 1024  # slice size inside a worker's byte range
+
+def byte_ranges(path, n_workers=N_WORKERS, chunk_bytes=None, size=None):
+    """Split the first `size` bytes of a file (all of it by default) into [start, end) byte ranges,
+    about one per worker and at most chunk_bytes each.
+
+    Ranges need not fall on line boundaries; iter_range_lines gives each line to
+    the range it starts in.
+    """
+    if chunk_bytes is None:
+        chunk_bytes = CHUNK_BYTES
+    file_size = os.path.getsize(path) if size is None else size
+    chunk_size = max(1, min(chunk_bytes, -(-file_size // n_workers)))
+    return [(start, min(start + chunk_size, file_size)) for start in range(0, file_size, chunk_size)]
+
+def line_offset(path, n):
+    """Byte offset just past the n-th newline of a file, where line n + 1 starts (the file size if it has no more lines)."""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return 0
+        
+        # Searching the map directly avoids copying the file into read buffers
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            pos = 0
+            for _ in range(n):
+                pos = mm.find(b'\n', pos) + 1
+                if pos == 0:
+                    return len(mm)
+            return pos
+
+def iter_range_lines(f, start, end, slice_size=SLICE_SIZE):
+    """Yield the lines (without newlines) of a binary file that start inside [start, end).
+
+    The file is memory-mapped; each slice of the map is cut at its last newline and
+    split in one go, so no partial line has to be carried over and re-joined.
+    """
+    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        pos = start
+        if start > 0:
+            # Skip the line straddling the boundary; the previous range owns it
+            pos = mm.find(b'\n', start - 1) + 1
+            if pos == 0:
+                return
+        
+        size = len(mm)
+        while pos < end:
+            stop = mm.rfind(b'\n', pos, min(pos + slice_size, size))
+            if stop < 0:
+                # A line longer than a slice, or the unterminated last line
+                stop = mm.find(b'\n', pos)
+                if stop < 0:
+                    yield mm[pos:]
+                    return
+            for line in mm[pos:stop].split(b'\n'):
+                if pos >= end:
+                    return
+                yield line
+                pos += len(line) + 1
+
+def run_chunks(worker, path, merge, extra=(), size=None, n_workers=N_WORKERS):
+    """Run worker over the byte ranges of a file's first `size` bytes (all of it by default) in a process pool.
+
+    Lines are independent records, so each range can be processed on its own.
+    worker((path, start, end, *extra)) returns (result, line_count, errors), with
+    errors as (label, line number in the range, detail) tuples. The results are
+    passed to merge(result, lines_before, lines_done) in file order, so writing or
+    merging them there gives the output of a sequential scan. Errors are printed
+    here as "label <file line number>: detail"; lines printed from several worker
+    processes would interleave. Returns the number of lines read.
+    """
+    chunks = [(path, start, end) + tuple(extra) for start, end in byte_ranges(path, n_workers, size=size)]
+    lines_done = 0
+    
+    with multiprocessing.Pool(n_workers) as pool:
+        # imap keeps chunk order, unlike imap_unordered
+        for result, line_count, errors in pool.imap(worker, chunks):
+            for label, line_num, detail in errors:
+                print(f"{label} {lines_done + line_num}: {detail}")
+            merge(result, lines_done, lines_done + line_count)
+            lines_done += line_count
+    
+    return lines_done
+
+def join_records(records):
+    """Join a list of encoded records into one newline-terminated JSONL buffer (b'' for none).
+
+    Workers build their output this way so the parent makes one write per chunk
+    rather than one per record. An empty tail is appended to the list.
+    """
+    records.append(b'')  # the empty tail adds the final newline
+    return b'\n'.join(records)
@@ -6,31 +6,71 @@ This script provides a comprehensive summary of the quality-enhanced FIM dataset
 and demonstrates how to use the quality scores for different applications.
 """
 
-import json
+from array import array
 import re
+import statistics
 from collections import defaultdict, Counter
 
-def analyze_final_dataset():
-    """Analyze the final dataset with comprehensive quality scores"""
-    
-    print("🎯 FIM DATASET QUALITY ANALYSIS")
-    print("=" * 60)
-    
-    filename = "prompts_codebricks_final_with_quality_scores.jsonl"
-    
-    stats = {
+import numpy as np
+
+from fim_utils import extract_fim_parts_v1 as extract_fim_parts
+from jsonl_io import iter_range_lines, line_offset, run_chunks
+from jsonl_io import json_loads as _json_loads
+
+try:
+    import simdjson
+except ImportError:  # simdjson is optional; records are then decoded in full with json_loads
+    simdjson = None
+
+# Top-level fields the analysis reads; the rest of a record (the content above all) is skipped
+_SUMMARY_FIELDS = ('quality_tier', 'quality_scores', 'quality_metrics')
+
+# The composite score as written in a raw line; a bare quoted key cannot occur inside a JSON string
+_COMPOSITE_KEY = b'"composite_quality"'
+_COMPOSITE_RE = re.compile(rb'"composite_quality"\s*:\s*([-+0-9.eE]+)')
+
+if simdjson is not None:
+    _parser = simdjson.Parser()
+    _MISSING = object()
+
+    def _load_fields(line, fields=_SUMMARY_FIELDS):
+        """Decode only the given top-level fields of a JSONL record, as plain Python values"""
+        doc = _parser.parse(line)
+        record = {}
+        for key in fields:
+            value = doc.get(key, _MISSING)
+            if value is _MISSING:
+                continue
+            if isinstance(value, simdjson.Object):
+                value = value.as_dict()
+            elif isinstance(value, simdjson.Array):
+                value = value.as_list()
+            record[key] = value
+        # No proxy may outlive this call: the parser is reused for the next line
+        return record
+else:
+    def _load_fields(line, fields=_SUMMARY_FIELDS):
+        """Decode a JSONL record (all of it; the caller only reads the given fields)"""
+        return _json_loads(line)
+
+ANALYSIS_SAMPLE_LINES = 200000  # Sample first 200K for quick analysis
+
+def _new_analysis_stats():
+    return {
         'total': 0,
         'quality_tiers': defaultdict(int),
+        # Packed C doubles (8 bytes per score instead of a float object plus list slot)
         'score_distributions': {
-            'phase1': [],
-            'phase2': [], 
-            'phase3': [],
-            'composite': []
+            'phase1': array('d'),
+            'phase2': array('d'), 
+            'phase3': array('d'),
+            'composite': array('d')
         },
+        # Lengths stay lists of ints so their range prints as integers
         'length_stats': {
             'prefix_lengths': [],
             'middle_lengths': [],
-            'ratios': []
+            'ratios': array('d')
         },
         'quality_features': {
             'complete_prefix': 0,
@@ -38,62 +78,93 @@ def analyze_final_dataset():
             'logical_flow': 0
         }
     }
+
+def _analyze_chunk(args):
+    """Collect the analysis stats of the lines starting inside the byte range [start, end) of the dataset.
+
+    Returns the chunk's stats, its number of lines and no errors (see run_chunks).
+    """
+    path, start, end = args
+    stats = _new_analysis_stats()
+    line_count = 0
     
-    print(f"📊 Analyzing: {filename}")
-    print(f"Processing dataset...")
-    
-    try:
-        with open(filename, 'r', encoding='utf-8') as f:
-            for line_num, line in enumerate(f, 1):
-                if line_num > 200000:  # Sample first 200K for quick analysis
-                    break
-                
-                line = line.strip()
-                if not line:
-                    continue
+    with open(path, 'rb') as f:
+        for line in iter_range_lines(f, start, end):
+            line_count += 1
+            
+            line = line.strip()
+            if not line:
+                continue
+            
+            stats['total'] += 1
+            
+            try:
+                data = _load_fields(line)
                 
-                stats['total'] += 1
+                # Quality tier distribution
+                tier = data.get('quality_tier', 'unknown')
+                stats['quality_tiers'][tier] += 1
                 
-                try:
-                    data = json.loads(line)
-                    
-                    # Quality tier distribution
-                    tier = data.get('quality_tier', 'unknown')
-                    stats['quality_tiers'][tier] += 1
-                    
-                    # Score distributions
-                    scores = data.get('quality_scores', {})
-                    for phase, phase_key in [
-                        ('phase1', 'phase1_context_quality'),
-                        ('phase2', 'phase2_middle_quality'), 
-                        ('phase3', 'phase3_length_quality'),
-                        ('composite', 'composite_quality')
-                    ]:
-                        if phase_key in scores:
-                            stats['score_distributions'][phase].append(scores[phase_key])
-                    
-                    # Length statistics
-                    metrics = data.get('quality_metrics', {})
-                    if 'prefix_length' in metrics:
-                        stats['length_stats']['prefix_lengths'].append(metrics['prefix_length'])
-                    if 'middle_length' in metrics:
-                        stats['length_stats']['middle_lengths'].append(metrics['middle_length'])
-                    if 'ratio' in metrics:
-                        stats['length_stats']['ratios'].append(metrics['ratio'])
-                    
-                    # Quality features
-                    if metrics.get('has_complete_prefix', False):
-                        stats['quality_features']['complete_prefix'] += 1
-                    if metrics.get('has_meaningful_completion', False):
-                        stats['quality_features']['meaningful_completion'] += 1
-                    if metrics.get('has_logical_flow', False):
-                        stats['quality_features']['logical_flow'] += 1
+                # Score distributions
+                scores = data.get('quality_scores', {})
+                for phase, phase_key in [
+                    ('phase1', 'phase1_context_quality'),
+                    ('phase2', 'phase2_middle_quality'), 
+                    ('phase3', 'phase3_length_quality'),
+                    ('composite', 'composite_quality')
+                ]:
+                    if phase_key in scores:
+                        stats['score_distributions'][phase].append(scores[phase_key])
                 
-                except json.JSONDecodeError:
-                    continue
+                # Length statistics
+                metrics = data.get('quality_metrics', {})
+                if 'prefix_length' in metrics:
+                    stats['length_stats']['prefix_lengths'].append(metrics['prefix_length'])
+                if 'middle_length' in metrics:
+                    stats['length_stats']['middle_lengths'].append(metrics['middle_length'])
+                if 'ratio' in metrics:
+                    stats['length_stats']['ratios'].append(metrics['ratio'])
                 
-                if line_num % 50000 == 0:
-                    print(f"  Processed {line_num:,} tasks...")
+                # Quality features
+                if metrics.get('has_complete_prefix', False):
+                    stats['quality_features']['complete_prefix'] += 1
+                if metrics.get('has_meaningful_completion', False):
+                    stats['quality_features']['meaningful_completion'] += 1
+                if metrics.get('has_logical_flow', False):
+                    stats['quality_features']['logical_flow'] += 1
+            
+            except ValueError:  # JSONDecodeError, or simdjson's parse errors
+                continue
+    
+    return stats, line_count, []
+
+def analyze_final_dataset():
+    """Analyze the final dataset with comprehensive quality scores"""
+    
+    print("🎯 FIM DATASET QUALITY ANALYSIS")
+    print("=" * 60)
+    
+    filename = "prompts_codebricks_final_with_quality_scores.jsonl"
+    
+    stats = _new_analysis_stats()
+    
+    print(f"📊 Analyzing: {filename}")
+    print(f"Processing dataset...")
+    
+    try:
+        def merge(chunk_stats, lines_before, lines_done):
+            stats['total'] += chunk_stats['total']
+            for tier, count in chunk_stats['quality_tiers'].items():
+                stats['quality_tiers'][tier] += count
+            for group in ('score_distributions', 'length_stats'):
+                for key, values in chunk_stats[group].items():
+                    stats[group][key].extend(values)
+            for feature, count in chunk_stats['quality_features'].items():
+                stats['quality_features'][feature] += count
+            
+            print(f"  Processed {lines_done:,} tasks...")
+        
+        run_chunks(_analyze_chunk, filename, merge, size=line_offset(filename, ANALYSIS_SAMPLE_LINES))
     
     except FileNotFoundError:
         print(f"❌ File {filename} not found!")
@@ -116,12 +187,14 @@ def analyze_final_dataset():
     print(f"\n📊 QUALITY SCORE STATISTICS:")
     print("-" * 40)
     
-    import statistics
+    # Summaries run over NumPy arrays; the dtype follows the values, so integer lengths stay integers.
+    # Means use fmean's exactly rounded sum: a pairwise float sum can tip a printed digit
     for phase, scores in stats['score_distributions'].items():
         if scores:
-            mean = statistics.mean(scores)
-            median = statistics.median(scores)
-            stdev = statistics.stdev(scores) if len(scores) > 1 else 0
+            scores = np.asarray(scores)
+            mean = statistics.fmean(scores)
+            median = np.median(scores)
+            stdev = scores.std(ddof=1) if len(scores) > 1 else 0  # sample stdev, like statistics.stdev
             print(f"{phase.capitalize():<12} Mean: {mean:.3f} ± {stdev:.3f}, Median: {median:.3f}")
     
     print(f"\n📏 LENGTH CHARACTERISTICS:")
@@ -129,10 +202,11 @@ def analyze_final_dataset():
     
     for metric, values in stats['length_stats'].items():
         if values:
-            mean = statistics.mean(values)
-            median = statistics.median(values)
-            min_val = min(values)
-            max_val = max(values)
+            values = np.asarray(values)
+            mean = statistics.fmean(values)
+            median = np.median(values)
+            min_val = values.min()
+            max_val = values.max()
             
             metric_name = metric.replace('_', ' ').title()
             print(f"{metric_name:<15} Mean: {mean:.1f}, Median: {median:.1f}, Range: {min_val}-{max_val}")
@@ -166,7 +240,7 @@ def demonstrate_quality_filtering():
     sample_count = 0
     
     try:
-        with open(filename, 'r', encoding='utf-8') as f:
+        with open(filename, 'rb') as f:
             for line in f:
                 if sample_count >= 50000:  # Limit sample
                     break
@@ -178,7 +252,14 @@ def demonstrate_quality_filtering():
                 sample_count += 1
                 
                 try:
-                    data = json.loads(line)
+                    # Without simdjson a decode covers the whole record, content included, so
+                    # lines whose only composite score is below the threshold are skipped undecoded
+                    if simdjson is None:
+                        match = _COMPOSITE_RE.search(line)
+                        if match and float(match.group(1)) < 0.9 and line.count(_COMPOSITE_KEY) == 1:
+                            continue
+                    
+                    data = _load_fields(line, ('quality_scores',))
                     scores = data.get('quality_scores', {})
                     composite = scores.get('composite_quality', 0)
                     
@@ -187,11 +268,12 @@ def demonstrate_quality_filtering():
                         
                         # Show first few examples
                         if high_quality_count <= 3:
+                            # Only the examples need the content and metrics
+                            data = _json_loads(line)
                             content = data.get('content', '')
                             
                             # Extract middle for display
-                            middle_match = re.search(r'<fim_middle>(.*?)$', content, re.DOTALL)
-                            middle = middle_match.group(1)[:100] if middle_match else ""
+                            middle = extract_fim_parts(content).get('middle', '')[:100]
                             
                             metrics = data.get('quality_metrics', {})
                             
@@ -202,7 +284,7 @@ def demonstrate_quality_filtering():
                             print(f"     Middle Length: {metrics.get('middle_length', 0)}")
                             print()
                 
-                except json.JSONDecodeError:
+                except ValueError:  # JSONDecodeError, or simdjson's parse errors
                     continue
         
         pct = high_quality_count / sample_count * 100 if sample_count > 0 else 0
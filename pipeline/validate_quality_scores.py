@@ -7,20 +7,18 @@ and provides analysis of the scoring distribution and sample tasks.
 """
 
 import json
-import re
 from datetime import datetime
 from collections import defaultdict
 
-def validate_quality_scores(filename):
-    """Validate quality scores in the dataset"""
-    
-    print(f"🔍 QUALITY SCORE VALIDATION")
-    print("=" * 50)
-    print(f"File: {filename}")
-    print(f"Start: {datetime.now().strftime('%H:%M:%S')}")
-    print()
-    
-    stats = {
+from fim_utils import extract_fim_parts_v1 as extract_fim_parts
+from jsonl_io import iter_range_lines, line_offset, run_chunks
+from jsonl_io import json_loads as _json_loads
+
+VALIDATION_SAMPLE_LINES = 100000  # Limit for quick validation
+SAMPLE_TASKS = 10
+
+def _new_validation_stats():
+    return {
         'total_tasks': 0,
         'tasks_with_scores': 0,
         'score_ranges': defaultdict(int),
@@ -33,80 +31,114 @@ def validate_quality_scores(filename):
         },
         'sample_tasks': []
     }
+
+def _validate_chunk(args):
+    """Validate the lines starting inside the byte range [start, end) of the dataset.
+
+    Returns the chunk's stats, its number of lines and its errors (see run_chunks);
+    sample line numbers count from the chunk start.
+    """
+    path, start, end = args
+    stats = _new_validation_stats()
+    errors = []
     
-    try:
-        with open(filename, 'r', encoding='utf-8') as f:
-            for line_num, line in enumerate(f, 1):
-                if line_num > 100000:  # Limit for quick validation
-                    break
-                
-                line = line.strip()
-                if not line:
-                    continue
-                
-                stats['total_tasks'] += 1
+    # Lines go to the decoder as bytes; only the fields read below become Python objects
+    with open(path, 'rb') as f:
+        line_num = 0
+        for line_num, line in enumerate(iter_range_lines(f, start, end), 1):
+            line = line.strip()
+            if not line:
+                continue
+            
+            stats['total_tasks'] += 1
+            
+            try:
+                data = _json_loads(line)
                 
-                try:
-                    data = json.loads(line)
-                    
-                    # Check for quality scores
-                    has_scores = 'quality_scores' in data
-                    if has_scores:
-                        stats['tasks_with_scores'] += 1
-                        
-                        scores = data['quality_scores']
-                        
-                        # Collect phase scores
-                        if 'phase1_context_quality' in scores:
-                            stats['phase_scores']['phase1'].append(scores['phase1_context_quality'])
-                        if 'phase2_middle_quality' in scores:
-                            stats['phase_scores']['phase2'].append(scores['phase2_middle_quality'])
-                        if 'phase3_length_quality' in scores:
-                            stats['phase_scores']['phase3'].append(scores['phase3_length_quality'])
-                        if 'composite_quality' in scores:
-                            composite = scores['composite_quality']
-                            stats['phase_scores']['composite'].append(composite)
-                            
-                            # Categorize composite scores
-                            if composite >= 0.8:
-                                stats['score_ranges']['high'] += 1
-                            elif composite >= 0.6:
-                                stats['score_ranges']['medium'] += 1
-                            elif composite >= 0.4:
-                                stats['score_ranges']['acceptable'] += 1
-                            else:
-                                stats['score_ranges']['low'] += 1
+                # Check for quality scores
+                has_scores = 'quality_scores' in data
+                if has_scores:
+                    stats['tasks_with_scores'] += 1
                     
-                    # Check for quality tier
-                    if 'quality_tier' in data:
-                        stats['quality_tiers'][data['quality_tier']] += 1
+                    scores = data['quality_scores']
                     
-                    # Collect sample tasks
-                    if len(stats['sample_tasks']) < 10 and has_scores:
-                        # Extract FIM parts for display
-                        content = data.get('content', '')
-                        prefix_match = re.search(r'<fim_prefix>(.*?)<fim_suffix>', content, re.DOTALL)
-                        middle_match = re.search(r'<fim_middle>(.*?)$', content, re.DOTALL)
+                    # Collect phase scores
+                    if 'phase1_context_quality' in scores:
+                        stats['phase_scores']['phase1'].append(scores['phase1_context_quality'])
+                    if 'phase2_middle_quality' in scores:
+                        stats['phase_scores']['phase2'].append(scores['phase2_middle_quality'])
+                    if 'phase3_length_quality' in scores:
+                        stats['phase_scores']['phase3'].append(scores['phase3_length_quality'])
+                    if 'composite_quality' in scores:
+                        composite = scores['composite_quality']
+                        stats['phase_scores']['composite'].append(composite)
                         
-                        sample = {
-                            'line_num': line_num,
-                            'prefix': prefix_match.group(1)[-100:] if prefix_match else "",
-                            'middle': middle_match.group(1) if middle_match else "",
-                            'scores': data.get('quality_scores', {}),
-                            'metrics': data.get('quality_metrics', {}),
-                            'tier': data.get('quality_tier', 'unknown')
-                        }
-                        stats['sample_tasks'].append(sample)
+                        # Categorize composite scores
+                        if composite >= 0.8:
+                            stats['score_ranges']['high'] += 1
+                        elif composite >= 0.6:
+                            stats['score_ranges']['medium'] += 1
+                        elif composite >= 0.4:
+                            stats['score_ranges']['acceptable'] += 1
+                        else:
+                            stats['score_ranges']['low'] += 1
                 
-                except json.JSONDecodeError:
-                    continue
-                except Exception as e:
-                    print(f"Error at line {line_num}: {e}")
-                    continue
+                # Check for quality tier
+                if 'quality_tier' in data:
+                    stats['quality_tiers'][data['quality_tier']] += 1
                 
-                # Progress update
-                if line_num % 25000 == 0:
-                    print(f"Validated {line_num:,} lines...")
+                # Collect sample tasks
+                if len(stats['sample_tasks']) < SAMPLE_TASKS and has_scores:
+                    # Extract FIM parts for display
+                    parts = extract_fim_parts(data.get('content', ''))
+                    
+                    sample = {
+                        'line_num': line_num,
+                        'prefix': parts.get('prefix', '')[-100:],
+                        'middle': parts.get('middle', ''),
+                        'scores': data.get('quality_scores', {}),
+                        'metrics': data.get('quality_metrics', {}),
+                        'tier': data.get('quality_tier', 'unknown')
+                    }
+                    stats['sample_tasks'].append(sample)
+            
+            except json.JSONDecodeError:
+                continue
+            except Exception as e:
+                errors.append(("Error at line", line_num, str(e)))
+                continue
+    
+    return stats, line_num, errors
+
+def validate_quality_scores(filename):
+    """Validate quality scores in the dataset"""
+    
+    print(f"🔍 QUALITY SCORE VALIDATION")
+    print("=" * 50)
+    print(f"File: {filename}")
+    print(f"Start: {datetime.now().strftime('%H:%M:%S')}")
+    print()
+    
+    stats = _new_validation_stats()
+    
+    try:
+        def merge(chunk_stats, lines_before, lines_done):
+            stats['total_tasks'] += chunk_stats['total_tasks']
+            stats['tasks_with_scores'] += chunk_stats['tasks_with_scores']
+            for group in ('score_ranges', 'quality_tiers'):
+                for key, count in chunk_stats[group].items():
+                    stats[group][key] += count
+            for phase, scores in chunk_stats['phase_scores'].items():
+                stats['phase_scores'][phase].extend(scores)
+            # Chunks arrive in file order, so these are still the first samples in the file
+            for sample in chunk_stats['sample_tasks'][:SAMPLE_TASKS - len(stats['sample_tasks'])]:
+                sample['line_num'] += lines_before
+                stats['sample_tasks'].append(sample)
+            
+            # Progress update
+            print(f"Validated {lines_done:,} lines...")
+        
+        run_chunks(_validate_chunk, filename, merge, size=line_offset(filename, VALIDATION_SAMPLE_LINES))
     
     except FileNotFoundError:
         print(f"❌ File {filename} not found!")
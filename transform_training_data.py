@@ -1,5 +1,21 @@
 import json
 
+from pipeline.jsonl_io import json_dumps
+
+try:
+    import ijson
+except ImportError:  # ijson is optional; the input array is then loaded with json.load
+    ijson = None
+
+JSON_ERRORS = (json.JSONDecodeError,) if ijson is None else (json.JSONDecodeError, ijson.JSONError)
+
+def _iter_items(f):
+    """Yield the items of the top-level JSON array in a binary file, streamed with ijson when installed"""
+    if ijson is not None:
+        yield from ijson.items(f, 'item')
+    else:
+        yield from json.load(f)
+
 def transform_prompts(input_file, output_file):
     """
     Transform prompts_nosuffix.json to new format:
@@ -8,42 +24,42 @@ def transform_prompts(input_file, output_file):
     3. Rename <FIM_MIDDLE> to <fim-suffix><fim-middle>
     """
     
-    # Read the input JSON file
-    with open(input_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
-    transformed_data = []
-    
-    for item in data:
-        # Combine prompt and output
-        prompt = item.get('prompt', '')
-        output = item.get('output', '')
-        content = prompt + output
-        
-        # Apply tag transformations
-        content = content.replace('<FIM_PREFIX>', '<fim-prefix>')
-        content = content.replace('<FIM_MIDDLE>', '<fim-suffix><fim-middle>')
-        
-        # Create new item with transformed content
-        new_item = {
-            'content': content
-        }
-        
-        # Preserve any other fields that might exist
-        for key, value in item.items():
-            if key not in ['prompt', 'output']:
-                new_item[key] = value
-        
-        transformed_data.append(new_item)
+    count = 0
     
-    # Write the transformed data to output file in JSONL format
-    with open(output_file, 'w', encoding='utf-8') as f:
-        for item in transformed_data:
-            json.dump(item, f, ensure_ascii=False)
-            f.write('\n')
+    # Items are transformed and written one at a time as the input is read
+    with open(input_file, 'rb') as f, open(output_file, 'wb', buffering=1 << 20) as out:
+        for item in _iter_items(f):
+            # Combine prompt and output
+            prompt = item.get('prompt', '')
+            output = item.get('output', '')
+            content = prompt + output
+            
+            # Apply tag transformations
+            content = content.replace('<FIM_PREFIX>', '<fim-prefix>')
+            content = content.replace('<FIM_MIDDLE>', '<fim-suffix><fim-middle>')
+            
+            # Create new item with transformed content
+            new_item = {
+                'content': content
+            }
+            
+            # Preserve any other fields that might exist
+            for key, value in item.items():
+                if key not in ['prompt', 'output']:
+                    new_item[key] = value
+            
+            # Write the transformed item to output file in JSONL format
+            # ijson yields non-integral numbers as Decimal; float() gives what json.load would have read
+            try:
+                line = json_dumps(new_item, default=float)
+            except TypeError:  # orjson only serializes integers up to 64 bits
+                line = json.dumps(new_item, ensure_ascii=False, default=float).encode('utf-8')
+            out.write(line)
+            out.write(b'\n')
+            count += 1
     
     print(f"Transformation complete! Output saved to {output_file}")
-    print(f"Processed {len(transformed_data)} items")
+    print(f"Processed {count} items")
 
 if __name__ == "__main__":
     #input_file = "prompts_nosuffix.json"
@@ -54,7 +70,7 @@ if __name__ == "__main__":
         transform_prompts(input_file, output_file)
     except FileNotFoundError:
         print(f"Error: {input_file} not found in current directory")
-    except json.JSONDecodeError:
+    except JSON_ERRORS:
         print(f"Error: {input_file} is not a valid JSON file")
     except Exception as e:
         print(f"Error: {e}")
\ No newline at end of file
@@ -4,29 +4,32 @@ Package Version Checker for test.py Dependencies
 This script prints detailed version information for all packages imported by test.py
 """
 
+import argparse
 import sys
 import os
-import pkg_resources
 import importlib
+import importlib.metadata
 import traceback
 
-def get_package_version(package_name):
+try:
+    from packaging.requirements import Requirement
+except ImportError:  # packaging is optional; see get_dependency_tree
+    Requirement = None
+
+def get_package_version(package_name, allow_import=True):
     """Get version of a package using multiple methods"""
     try:
-        # Method 1: Using pkg_resources
-        return pkg_resources.get_distribution(package_name).version
+        # Method 1: Using importlib.metadata (reads the installed METADATA, no import)
+        return importlib.metadata.version(package_name)
     except:
+        if not allow_import:
+            return "Not found"
         try:
             # Method 2: Using importlib and __version__
             module = importlib.import_module(package_name)
             return getattr(module, '__version__', 'Unknown')
         except:
-            try:
-                # Method 3: Using importlib.metadata (Python 3.8+)
-                import importlib.metadata
-                return importlib.metadata.version(package_name)
-            except:
-                return "Not found"
+            return "Not found"
 
 def check_cuda_info():
     """Check CUDA availability and version"""
@@ -42,11 +45,29 @@ def check_cuda_info():
     except Exception as e:
         print(f"Error checking CUDA info: {e}")
 
+def check_nvidia_driver():
+    """Show the NVIDIA driver version without initializing CUDA"""
+    try:
+        with open('/proc/driver/nvidia/version') as f:
+            print(f.readline().strip())
+    except OSError:
+        print("NVIDIA driver: Not found")
+
 def get_dependency_tree(package_name):
     """Get dependencies of a package"""
     try:
-        dist = pkg_resources.get_distribution(package_name)
-        return [str(req) for req in dist.requires()]
+        requires = importlib.metadata.distribution(package_name).requires or []
+        
+        # Requires-Dist also lists the optional extras; keep the requirements that apply without them
+        if Requirement is None:
+            # Markers cannot be evaluated without packaging, so only the extras are dropped
+            return [req for req in requires if 'extra' not in req.partition(';')[2]]
+        
+        deps = []
+        for req in map(Requirement, requires):
+            if req.marker is None or req.marker.evaluate({'extra': ''}):
+                deps.append(str(req))
+        return deps
     except:
         return []
 
@@ -84,6 +105,12 @@ related_packages = [
     'psutil'
 ]
 
+parser = argparse.ArgumentParser(description="Print the versions of the packages imported by test.py")
+parser.add_argument('--versions-only', action='store_true',
+                    help="read versions from package metadata only and skip the torch/transformers/trl import checks")
+args = parser.parse_args()
+allow_import = not args.versions_only
+
 print("=" * 80)
 print("PACKAGE VERSION REPORT for test.py")
 print("=" * 80)
@@ -97,7 +124,7 @@ for package in direct_imports:
     if package in ['argparse', 'multiprocessing', 'os']:
         print(f"{package:20} : Built-in module")
     else:
-        version = get_package_version(package)
+        version = get_package_version(package, allow_import)
         print(f"{package:20} : {version}")
         
         # Show some key dependencies for ML packages
@@ -112,56 +139,61 @@ print()
 print("RELATED/DEPENDENCY PACKAGES:")
 print("-" * 40)
 for package in related_packages:
-    version = get_package_version(package)
+    version = get_package_version(package, allow_import)
     if version != "Not found":
         print(f"{package:20} : {version}")
 
 print()
 print("CUDA AND GPU INFORMATION:")
 print("-" * 40)
-check_cuda_info()
+if args.versions_only:
+    # Importing torch initializes CUDA; the driver reports its version through /proc
+    check_nvidia_driver()
+else:
+    check_cuda_info()
 
-print()
-print("DETAILED TRANSFORMERS INFORMATION:")
-print("-" * 40)
-try:
-    import transformers
-    print(f"Transformers version: {transformers.__version__}")
-    print(f"Transformers file location: {transformers.__file__}")
-    
-    # Check if specific functions are available
-    try:
-        from transformers import top_k_top_p_filtering
-        print("✓ top_k_top_p_filtering is available")
-    except ImportError as e:
-        print(f"✗ top_k_top_p_filtering not available: {e}")
-    
+if not args.versions_only:
+    print()
+    print("DETAILED TRANSFORMERS INFORMATION:")
+    print("-" * 40)
     try:
-        from transformers.generation.utils import top_k_top_p_filtering
-        print("✓ top_k_top_p_filtering available from generation.utils")
-    except ImportError as e:
-        print(f"✗ top_k_top_p_filtering not available from generation.utils: {e}")
-    
-except Exception as e:
-    print(f"Error importing transformers: {e}")
+        import transformers
+        print(f"Transformers version: {transformers.__version__}")
+        print(f"Transformers file location: {transformers.__file__}")
+        
+        # Check if specific functions are available
+        try:
+            from transformers import top_k_top_p_filtering
+            print("✓ top_k_top_p_filtering is available")
+        except ImportError as e:
+            print(f"✗ top_k_top_p_filtering not available: {e}")
+        
+        try:
+            from transformers.generation.utils import top_k_top_p_filtering
+            print("✓ top_k_top_p_filtering available from generation.utils")
+        except ImportError as e:
+            print(f"✗ top_k_top_p_filtering not available from generation.utils: {e}")
+        
+    except Exception as e:
+        print(f"Error importing transformers: {e}")
 
-print()
-print("DETAILED TRL INFORMATION:")
-print("-" * 40)
-try:
-    import trl
-    print(f"TRL version: {trl.__version__}")
-    print(f"TRL file location: {trl.__file__}")
-    
-    # Check TRL imports
+    print()
+    print("DETAILED TRL INFORMATION:")
+    print("-" * 40)
     try:
-        from trl import SFTTrainer, SFTConfig
-        print("✓ SFTTrainer and SFTConfig are available")
-    except ImportError as e:
-        print(f"✗ SFTTrainer/SFTConfig not available: {e}")
-    
-except Exception as e:
-    print(f"Error importing trl: {e}")
+        import trl
+        print(f"TRL version: {trl.__version__}")
+        print(f"TRL file location: {trl.__file__}")
+        
+        # Check TRL imports
+        try:
+            from trl import SFTTrainer, SFTConfig
+            print("✓ SFTTrainer and SFTConfig are available")
+        except ImportError as e:
+            print(f"✗ SFTTrainer/SFTConfig not available: {e}")
+        
+    except Exception as e:
+        print(f"Error importing trl: {e}")
 
 print()
 print("ENVIRONMENT INFORMATION:")